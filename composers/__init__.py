@@ -3,8 +3,9 @@
 编曲器模块，负责将多轨音乐组合成完整的作品。
 """
 
-from .simple_arranger import SimpleArranger
+from .simple_arranger import SimpleArranger, TrackColumns
 
 __all__ = [
     'SimpleArranger',
+    'TrackColumns',
 ]
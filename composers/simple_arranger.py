@@ -1,13 +1,181 @@
 from mido import MidiFile, MidiTrack, MetaMessage, Message
 from core.theory import Key
+from array import array
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import BinaryIO, Callable, List, Optional, Sequence, Tuple
+import io
+import itertools
 import random
+import shutil
+import struct
+import tempfile
+
+def _structure_curve(progress: float) -> float:
+    """
+    结构因子曲线，progress 为乐曲进度 (0.0-1.0)
+
+    简单的结构逻辑：
+    前 15% (前奏): 0.6 ~ 1.0 渐入
+    15% - 70% (主体): 1.0
+    70% - 90% (高潮): 1.0 ~ 1.2 渐强
+    90% - 100% (尾声): 1.2 ~ 0.7 渐出
+    """
+    if progress < 0.15:
+        # 前奏渐入
+        return 0.6 + (progress / 0.15) * 0.4
+    elif progress < 0.70:
+        # 主体保持
+        return 1.0
+    elif progress < 0.90:
+        # 高潮渐强
+        return 1.0 + ((progress - 0.70) / 0.20) * 0.2
+    else:
+        # 尾声渐弱
+        return 1.2 - ((progress - 0.90) / 0.10) * 0.5
+
+# 结构因子查找表：按进度均匀采样，逐音符查表代替分段计算
+_STRUCTURE_LUT_SIZE = 1024
+_STRUCTURE_FACTOR_LUT = tuple(
+    _structure_curve(i / (_STRUCTURE_LUT_SIZE - 1)) for i in range(_STRUCTURE_LUT_SIZE)
+)
+
+def _compute_note_events(durations_beats: Sequence[float], velocities: Sequence[int],
+                         ticks_per_beat: int, rand: Callable[[], float]) -> Tuple[List[int], List[int]]:
+    """
+    音轨数值计算核心，只处理数字列表，不涉及 mido 对象
+
+    :param durations_beats: 每个音符的时值（拍）
+    :param velocities: 每个音符的原始力度
+    :param ticks_per_beat: MIDI 分辨率
+    :param rand: 返回 [0, 1) 随机数的函数，用于人性化偏移
+    :return: (每个音符的 ticks, 应用结构因子后的力度)
+    """
+    # 1. 时值 ticks，添加微小的随机偏移（人性化），随机数一次性按音符数抽取
+    offsets = [rand() - 0.5 for _ in durations_beats]
+    base_ticks = [int(d * ticks_per_beat) for d in durations_beats]
+    duration_ticks = [max(1, ticks + int(ticks * 0.05 * offset)) for ticks, offset in zip(base_ticks, offsets)]
+
+    # 2. 每个音符的起始时间与总时长，用于结构分析
+    end_ticks = list(itertools.accumulate(duration_ticks))
+    total_ticks = end_ticks[-1]
+    start_ticks = [0] + end_ticks[:-1]
+
+    # 3. 应用结构因子（高潮、前奏、尾声处理），按进度查表
+    lut = _STRUCTURE_FACTOR_LUT
+    last_index = _STRUCTURE_LUT_SIZE - 1
+    final_velocities = [
+        int(min(127, max(1, velocity * lut[min(last_index, start * last_index // total_ticks)])))
+        for velocity, start in zip(velocities, start_ticks)
+    ]
+
+    return duration_ticks, final_velocities
+
+@lru_cache(maxsize=64)
+def _build_meta_messages(tempo: int, key_name: str) -> Tuple[MetaMessage, ...]:
+    """
+    构建全局 Meta 信息 (速度、拍号、调号)
+    相同的 (速度, 调) 组合复用同一组消息对象，消息只读，不要修改
+    """
+    # 1. 设置速度
+    microseconds_per_beat = 60_000_000 // tempo
+
+    return (
+        MetaMessage('set_tempo', tempo=microseconds_per_beat),
+        # 2. 设置拍号 - 默认 4/4
+        MetaMessage('time_signature', numerator=4, denominator=4,
+                    clocks_per_click=24, notated_32nd_notes_per_beat=8),
+        # 3. 设置调号
+        MetaMessage('key_signature', key=key_name),
+    )
+
+@dataclass(frozen=True, slots=True)
+class TrackColumns:
+    """
+    按列存放的音轨数据：音高、时值（拍）、力度三个等长序列
+    可直接使用 array('h') / array('d') / array('B')，不必为每个音符构建元组
+    """
+    pitches: Sequence[int]
+    durations: Sequence[float]
+    velocities: Sequence[int]
+
+def _normalize_notes(notes_data) -> List[Tuple[int, float, int]]:
+    """
+    逐项解析音符数据，各项格式可以混合
+    规则与逐音符处理时一致：(note, duration[, velocity, ...]) 或 note，无法识别的项被跳过
+    """
+    normalized_notes = []
+    append = normalized_notes.append
+    for item in notes_data:
+        if isinstance(item, (tuple, list)):
+            if len(item) >= 3:
+                append((item[0], item[1], item[2]))
+            elif len(item) == 2:
+                # 默认力度
+                append((item[0], item[1], 100))
+        elif isinstance(item, int):
+            append((item, 1.0, 100))
+    return normalized_notes
+
+def _columns_from_notes(notes_data) -> Tuple[Sequence[int], Sequence[float], Sequence[int]]:
+    """
+    把逐音符数据统一拆分为 (音高, 时值, 力度) 三列
+    支持 [note, ...]、[(note, duration), ...] 与 [(note, duration, velocity), ...]，无法识别时返回三个空列
+    """
+    if not isinstance(notes_data, list) or not notes_data:
+        return (), (), ()
+
+    # 以首个元素推断整列格式，走批量转置的快速路径，不再逐项判断类型；
+    # 整列格式不一致时（如二元组与三元组混合）批量转换会抛出异常，退回逐项解析
+    first_item = notes_data[0]
+    count = len(notes_data)
+    try:
+        if isinstance(first_item, int):
+            return array('h', notes_data), (1.0,) * count, (100,) * count
+        if isinstance(first_item, (tuple, list)):
+            if len(first_item) == 3:
+                pitches, durations_beats, velocities = zip(*notes_data, strict=True)
+                return pitches, durations_beats, velocities
+            if len(first_item) == 2:
+                pitches, durations_beats = zip(*notes_data, strict=True)
+                return pitches, durations_beats, (100,) * count
+    except (TypeError, ValueError, OverflowError):
+        pass
+
+    normalized_notes = _normalize_notes(notes_data)
+    if not normalized_notes:
+        return (), (), ()
+
+    pitches, durations_beats, velocities = zip(*normalized_notes)
+    return pitches, durations_beats, velocities
+
+# MThd 头中音轨数字段的文件偏移：'MThd'(4) + 长度(4) + 格式(2)
+_HEADER_TRACK_COUNT_OFFSET = 10
+# 完整 MThd 块长度：'MThd'(4) + 长度(4) + 格式/音轨数/分辨率(6)
+_HEADER_SIZE = 14
+
+def _encode_track_chunk(track: MidiTrack, ticks_per_beat: int) -> bytes:
+    """
+    把单条音轨编码为完整的 MTrk 块
+    借助公开的 MidiFile.save 序列化只含该音轨的文件，再去掉 MThd 头
+    """
+    buffer = io.BytesIO()
+    MidiFile(ticks_per_beat=ticks_per_beat, tracks=[track]).save(file=buffer)
+    return buffer.getbuffer()[_HEADER_SIZE:]
 
 class SimpleArranger:
-    def __init__(self, tempo: int, key: Key):
+    def __init__(self, tempo: int, key: Key, seed: Optional[int] = None, stream: bool = False):
+        """
+        :param stream: 流式模式。每条音轨在 add_track 结束时立即编码写入临时文件并释放，
+                       内存中只保留当前音轨；save() 回填音轨数后把临时文件复制到目标路径
+        """
         self.mid = MidiFile()
         self.tempo = tempo
         self.key = key
 
+        # 人性化偏移使用独立的随机数生成器，指定 seed 时结果可复现
+        self.rng = random.Random(seed)
+
         # 设定 MIDI 分辨率 (TPQN: Ticks Per Quarter Note)
         self.ticks_per_beat = 480
 
@@ -15,56 +183,29 @@ class SimpleArranger:
         self.meta_track = MidiTrack()
         self.mid.tracks.append(self.meta_track)
 
-        # 1. 设置速度
-        microseconds_per_beat = int(60_000_000 / tempo)
-        self.meta_track.append(MetaMessage('set_tempo', tempo=microseconds_per_beat))
+        self.meta_track.extend(_build_meta_messages(tempo, key.value))
 
-        # 2. 设置拍号 - 默认 4/4
-        self.meta_track.append(MetaMessage('time_signature', numerator=4, denominator=4,
-                                           clocks_per_click=24, notated_32nd_notes_per_beat=8))
-        self.meta_track.append(MetaMessage('key_signature', key=key.value))
-
-    def _get_note_duration_ticks(self, duration_beats: float) -> int:
-        """将拍数转换为 ticks"""
-        ticks = int(duration_beats * self.ticks_per_beat)
-        # 添加微小的随机偏移（人性化）
-        variation = int(ticks * 0.05 * (random.random() - 0.5))
-        return max(1, ticks + variation)
-
-    def _calculate_structure_factor(self, current_time_ticks: int, total_ticks: int) -> float:
-        """
-        根据乐曲位置计算结构因子（力度系数）
-        模拟前奏（弱）、高潮（强）、尾声（弱）的效果
-        """
-        if total_ticks == 0:
-            return 1.0
-
-        progress = current_time_ticks / total_ticks
-
-        # 简单的结构逻辑：
-        # 前 15% (前奏): 0.6 ~ 1.0 渐入
-        # 15% - 70% (主体): 1.0
-        # 70% - 90% (高潮): 1.0 ~ 1.2 渐强
-        # 90% - 100% (尾声): 1.2 ~ 0.7 渐出
-
-        if progress < 0.15:
-            # 前奏渐入
-            return 0.6 + (progress / 0.15) * 0.4
-        elif progress < 0.70:
-            # 主体保持
-            return 1.0
-        elif progress < 0.90:
-            # 高潮渐强
-            return 1.0 + ((progress - 0.70) / 0.20) * 0.2
-        else:
-            # 尾声渐弱
-            return 1.2 - ((progress - 0.90) / 0.10) * 0.5
+        # 流式模式：先向临时文件写入文件头（音轨数占位），再逐条写入音轨块；
+        # 临时文件没有名字，关闭或被回收时由系统删除，不会在磁盘上留下不完整的 MIDI 文件
+        self._stream: Optional[BinaryIO] = None
+        self._streamed_tracks = 0
+        if stream:
+            self._stream = tempfile.TemporaryFile()
+            self._stream.write(b'MThd' + struct.pack('>Lhhh', 6, 1, 0, self.ticks_per_beat))
+            self._flush_tracks()
+
+    def _flush_tracks(self):
+        """流式模式下把已完成的音轨写入临时文件，并从内存中移除"""
+        for track in self.mid.tracks:
+            self._stream.write(_encode_track_chunk(track, self.ticks_per_beat))
+            self._streamed_tracks += 1
+        self.mid.tracks.clear()
 
     def add_track(self, name: str, generator, channel: int, program: int = 0):
         """
         动态添加音轨
         :param name: 音轨名称
-        :param generator: 生成器实例，必须实现 generate(key) 方法
+        :param generator: 生成器实例，必须实现 generate(key) 方法，返回逐音符列表或 TrackColumns
         :param channel: MIDI 通道号 (0-15)
         :param program: GM音色编号 (0-127)，默认为0 (Acoustic Grand Piano)
         """
@@ -78,58 +219,54 @@ class SimpleArranger:
         # 注意：time=0 表示紧随前面的消息立即发送
         track.append(Message('program_change', program=program, time=0, channel=channel))
 
-        # 获取音符数据
+        # 获取音符数据，按列数据直接使用，逐音符数据先拆分为三列
         notes_data = generator.generate(self.key)
+        if isinstance(notes_data, TrackColumns):
+            pitches, durations_beats, velocities = notes_data.pitches, notes_data.durations, notes_data.velocities
+        else:
+            pitches, durations_beats, velocities = _columns_from_notes(notes_data)
+
+        if not pitches:
+            return self
+
+        # 整列批量计算，避免在逐音符循环中做算术
+
+        duration_ticks, final_velocities = _compute_note_events(
+            durations_beats, velocities, self.ticks_per_beat, self.rng.random
+        )
+
+        # 先构建完整的消息列表，再一次性写入音轨
+        messages = []
+        append = messages.append
+        for note, velocity, ticks in zip(pitches, final_velocities, duration_ticks):
+            # Note On
+            append(Message('note_on', note=note, velocity=velocity, time=0, channel=channel))
 
-        # 统一转换为 (note, duration, velocity) 格式进行处理
-        normalized_notes = []
-        if isinstance(notes_data, list) and len(notes_data) > 0:
-            first_item = notes_data[0]
-
-            # 1. 预计算总时长，用于结构分析
-            total_duration_beats = 0
-            for item in notes_data:
-                if isinstance(item, (tuple, list)):
-                    total_duration_beats += item[1]
-                else:
-                    total_duration_beats += 1.0
-
-            total_ticks = int(total_duration_beats * self.ticks_per_beat)
-            current_time_ticks = 0
-
-            for item in notes_data:
-                # 解析数据
-                if isinstance(item, (tuple, list)):
-                    if len(item) >= 3:
-                        note, duration_beats, velocity = item[0], item[1], item[2]
-                    elif len(item) == 2:
-                        note, duration_beats = item[0], item[1]
-                        velocity = 100 # 默认力度
-                    else:
-                        continue
-                elif isinstance(item, int):
-                    note = item
-                    duration_beats = 1.0
-                    velocity = 100
-                else:
-                    continue
-
-                duration_ticks = self._get_note_duration_ticks(duration_beats)
-
-                # 应用结构因子（高潮、前奏、尾声处理）
-                structure_factor = self._calculate_structure_factor(current_time_ticks, total_ticks)
-                final_velocity = int(min(127, max(1, velocity * structure_factor)))
-
-                # Note On
-                track.append(Message('note_on', note=note, velocity=final_velocity, time=0, channel=channel))
-
-                # Note Off
-                track.append(Message('note_off', note=note, velocity=0, time=duration_ticks, channel=channel))
-
-                # 更新时间指针
-                current_time_ticks += duration_ticks
+            # Note Off：使用力度为 0 的 note_on，与 note_on 共享 running status
+            append(Message('note_on', note=note, velocity=0, time=ticks, channel=channel))
+        track.extend(messages)
+
+        if self._stream is not None:
+            self._flush_tracks()
 
         return self
 
     def save(self, filepath: str):
-        self.mid.save(filepath)
+        """
+        保存 MIDI 文件
+        流式模式下先回填临时文件头中的音轨数，再分块复制到 filepath；之后仍可继续添加音轨并再次保存
+        """
+        if self._stream is None:
+            # 先在内存中序列化整个文件，再一次性写入磁盘，避免逐条消息的小块写入
+            buffer = io.BytesIO()
+            self.mid.save(file=buffer)
+            with open(filepath, 'wb') as outfile:
+                outfile.write(buffer.getbuffer())
+            return
+
+        self._stream.seek(_HEADER_TRACK_COUNT_OFFSET)
+        self._stream.write(struct.pack('>h', self._streamed_tracks))
+        self._stream.seek(0)
+        with open(filepath, 'wb') as outfile:
+            shutil.copyfileobj(self._stream, outfile)
+        self._stream.seek(0, io.SEEK_END)
@@ -2,12 +2,12 @@
 这个模块提供了节奏型的定义和基础数据，属于不可变的音乐理论层。
 包括： - 基础节拍类型 - 预定义节奏型 - 节奏模式分析工具
 """
-from enum import Enum
+from enum import Enum, IntEnum
 from typing import List, Tuple, Dict
 import math
 
-class BeatType(Enum):
-    """拍号类型枚举"""
+class BeatType(IntEnum):
+    """拍号类型枚举，成员可直接参与整数运算"""
     SIMPLE_DUPLE = 2      # 单二拍
     SIMPLE_TRIPLE = 3     # 单三拍
     SIMPLE_QUADRUPLE = 4  # 单四拍
@@ -15,8 +15,8 @@ class BeatType(Enum):
     COMPOUND_TRIPLE = 9   # 复三拍
     COMPOUND_QUADRUPLE = 12  # 复四拍
 
-class TimeSignature(Enum):
-    """拍号枚举"""
+class TimeSignature(tuple, Enum):
+    """拍号枚举，成员本身即 (分子, 分母) 元组，可直接解包"""
     TWO_FOUR = (2, 4)   # 2/4 拍
     THREE_FOUR = (3, 4) # 3/4 拍
     FOUR_FOUR = (4, 4)  # 4/4 拍
@@ -24,3 +24,13 @@ class TimeSignature(Enum):
     THREE_EIGHT = (3, 8) # 3/8 拍
     NINE_EIGHT = (9, 8)  # 9/8 拍
     TWELVE_EIGHT = (12, 8) # 12/8 拍
+
+    @property
+    def numerator(self) -> int:
+        """每小节拍数"""
+        return self[0]
+
+    @property
+    def denominator(self) -> int:
+        """以几分音符为一拍"""
+        return self[1]
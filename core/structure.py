@@ -1,27 +1,37 @@
+from array import array
 from core.theory import Key
 
 class PhraseBuilder:
     def __init__(self, length=16):
         self.length = length
-        self.pieces = []
+        # 按乐句长度预分配 int16 连续缓冲区，写入位置由 _idx 记录
+        self.pieces = array('h', [0]) * length
+        self._idx = 0
+
+    def _extend(self, notes: list):
+        """追加音符，超出乐句长度的部分直接丢弃"""
+        n = min(len(notes), self.length - self._idx)
+        if n > 0:
+            self.pieces[self._idx:self._idx + n] = array('h', notes[:n])
+            self._idx += n
 
     def add_motif(self, notes: list, repeat: int = 1):
         """添加动机并重复"""
-        for _ in range(repeat):
-            self.pieces.extend(notes)
+        self._extend(notes * repeat)
         return self
 
     def add_variation(self, motif: list, transform_func):
         """添加变奏"""
-        self.pieces.extend(transform_func(motif))
+        if self._idx < self.length:
+            self._extend(transform_func(motif))
         return self
 
     def add_cadence(self, key: Key):
         """添加终止式（落回主音）"""
         # 修改前：self.pieces.extend([key.value[0], key.value[0]])
         # 修改后：使用 key.tonic 获取整数类型的MIDI音高
-        self.pieces.extend([key.tonic, key.tonic])
+        self._extend([key.tonic, key.tonic])
         return self
 
     def build(self):
-        return self.pieces[:self.length]
+        return self.pieces[:self._idx].tolist()
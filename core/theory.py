@@ -10,8 +10,11 @@ MIDI Music Generator - Core Music Theory Module
 """
 
 from enum import Enum
-from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from dataclasses import dataclass, replace
+from functools import lru_cache
+import itertools
+from types import MappingProxyType
+from typing import Dict, List, Optional, Sequence, Tuple
 import random
 
 # ==================== 基础常量 ====================
@@ -37,6 +40,9 @@ INTERVALS = {
     "octave": 12
 }
 
+# 音级罗马数字名称，按级数 0-6 索引
+SCALE_DEGREE_NAMES = ("I", "II", "III", "IV", "V", "VI", "VII")
+
 # ==================== 调式和音阶 ====================
 
 class ScaleType(Enum):
@@ -99,25 +105,60 @@ class Key(Enum):
     @property
     def tonic(self) -> int:
         """获取主音的MIDI音符编号（默认以C4=60为基准）"""
-        base_notes = {
-            "C": 60, "C#": 61, "Db": 61, "D": 62, "D#": 63, "Eb": 63,
-            "E": 64, "F": 65, "F#": 66, "Gb": 66, "G": 67, "G#": 68,
-            "Ab": 68, "A": 69, "A#": 70, "Bb": 70, "B": 71
-        }
-        key_name = self.value.replace("m", "")  # 移除小调标记
-        return base_notes.get(key_name, 60)
+        return _KEY_TONIC[self]
 
     @property
     def is_minor(self) -> bool:
         """判断是否为小调"""
-        return self.value.endswith("m")
+        return _KEY_IS_MINOR[self]
 
     @property
     def scale_type(self) -> ScaleType:
         """获取默认音阶类型"""
-        return ScaleType.MINOR if self.is_minor else ScaleType.MAJOR
+        return _KEY_SCALE_TYPE[self]
+
+# 主音名称对应的MIDI音符编号（以C4=60为基准）
+_TONIC_NOTES = {
+    "C": 60, "C#": 61, "Db": 61, "D": 62, "D#": 63, "Eb": 63,
+    "E": 64, "F": 65, "F#": 66, "Gb": 66, "G": 67, "G#": 68,
+    "Ab": 68, "A": 69, "A#": 70, "Bb": 70, "B": 71
+}
 
-def get_scale_intervals(scale_type: ScaleType) -> List[int]:
+# 每个调的主音和大小调属性，导入时计算一次
+_KEY_IS_MINOR = {key: key.value.endswith("m") for key in Key}
+_KEY_TONIC = {key: _TONIC_NOTES.get(key.value.replace("m", ""), 60) for key in Key}  # 移除小调标记
+_KEY_SCALE_TYPE = {key: ScaleType.MINOR if is_minor else ScaleType.MAJOR
+                   for key, is_minor in _KEY_IS_MINOR.items()}
+
+# 各音阶类型的半音间隔模式
+_SCALE_INTERVALS = {
+    ScaleType.MAJOR: (2, 2, 1, 2, 2, 2, 1),
+    ScaleType.MINOR: (2, 1, 2, 2, 1, 2, 2),
+    ScaleType.HARMONIC_MINOR: (2, 1, 2, 2, 1, 3, 1),
+    ScaleType.MELODIC_MINOR: (2, 1, 2, 2, 2, 2, 1),
+    ScaleType.DORIAN: (2, 1, 2, 2, 2, 1, 2),
+    ScaleType.PHRYGIAN: (1, 2, 2, 2, 1, 2, 2),
+    ScaleType.LYDIAN: (2, 2, 2, 1, 2, 2, 1),
+    ScaleType.MIXOLYDIAN: (2, 2, 1, 2, 2, 1, 2),
+    ScaleType.LOCRIAN: (1, 2, 2, 1, 2, 2, 2),
+    ScaleType.PENTATONIC_MAJOR: (2, 2, 3, 2, 3),
+    ScaleType.PENTATONIC_MINOR: (3, 2, 2, 3, 2),
+    ScaleType.BLUES: (3, 2, 1, 1, 3, 2),
+    ScaleType.CHROMATIC: (1,) * 12,
+    ScaleType.WHOLE_TONE: (2,) * 6
+}
+
+# 各音阶类型一个八度内各音相对主音的偏移，以及整个音阶跨越的半音数
+_SCALE_OFFSETS = {
+    scale_type: (tuple(itertools.accumulate(intervals[:-1], initial=0)), sum(intervals))
+    for scale_type, intervals in _SCALE_INTERVALS.items()
+}
+
+# 未知音阶类型时的默认值（大调），避免每次调用时访问枚举成员
+_DEFAULT_SCALE_INTERVALS = _SCALE_INTERVALS[ScaleType.MAJOR]
+_DEFAULT_SCALE_OFFSETS = _SCALE_OFFSETS[ScaleType.MAJOR]
+
+def get_scale_intervals(scale_type: ScaleType) -> Tuple[int, ...]:
     """
     获取指定音阶类型的半音间隔模式
 
@@ -125,30 +166,16 @@ def get_scale_intervals(scale_type: ScaleType) -> List[int]:
         scale_type: 音阶类型
 
     返回:
-        半音间隔列表，例如大调是 [2,2,1,2,2,2,1]
-    """
-    scales = {
-        ScaleType.MAJOR: [2, 2, 1, 2, 2, 2, 1],
-        ScaleType.MINOR: [2, 1, 2, 2, 1, 2, 2],
-        ScaleType.HARMONIC_MINOR: [2, 1, 2, 2, 1, 3, 1],
-        ScaleType.MELODIC_MINOR: [2, 1, 2, 2, 2, 2, 1],
-        ScaleType.DORIAN: [2, 1, 2, 2, 2, 1, 2],
-        ScaleType.PHRYGIAN: [1, 2, 2, 2, 1, 2, 2],
-        ScaleType.LYDIAN: [2, 2, 2, 1, 2, 2, 1],
-        ScaleType.MIXOLYDIAN: [2, 2, 1, 2, 2, 1, 2],
-        ScaleType.LOCRIAN: [1, 2, 2, 1, 2, 2, 2],
-        ScaleType.PENTATONIC_MAJOR: [2, 2, 3, 2, 3],
-        ScaleType.PENTATONIC_MINOR: [3, 2, 2, 3, 2],
-        ScaleType.BLUES: [3, 2, 1, 1, 3, 2],
-        ScaleType.CHROMATIC: [1] * 12,
-        ScaleType.WHOLE_TONE: [2] * 6
-    }
-    return scales.get(scale_type, [2, 2, 1, 2, 2, 2, 1])
+        半音间隔元组，例如大调是 (2,2,1,2,2,2,1)
+    """
+    return _SCALE_INTERVALS.get(scale_type, _DEFAULT_SCALE_INTERVALS)
 
+@lru_cache(maxsize=None)
 def get_scale_notes(key: Key, scale_type: Optional[ScaleType] = None,
-                   octave: int = 4, num_octaves: int = 1) -> List[int]:
+                   octave: int = 4, num_octaves: int = 1) -> Tuple[int, ...]:
     """
     获取指定调式的音阶音符
+    参数组合有限，结果按参数缓存，返回的元组在调用方之间共享
 
     参数:
         key: 调
@@ -157,22 +184,18 @@ def get_scale_notes(key: Key, scale_type: Optional[ScaleType] = None,
         num_octaves: 八度数量
 
     返回:
-        MIDI音符编号列表
+        MIDI音符编号元组
     """
     if scale_type is None:
         scale_type = key.scale_type
 
-    intervals = get_scale_intervals(scale_type)
+    offsets, span = _SCALE_OFFSETS.get(scale_type, _DEFAULT_SCALE_OFFSETS)
     tonic = key.tonic + (octave - 4) * 12
 
-    notes = [tonic]
-    current_note = tonic
-
-    for interval in intervals * num_octaves:
-        current_note += interval
-        notes.append(current_note)
-
-    return notes[:-1]  # 移除最后一个重复的主音
+    # 一个八度内的偏移逐八度平移，不再逐音累加
+    return tuple(tonic + span * octave_index + offset
+                 for octave_index in range(num_octaves)
+                 for offset in offsets)
 
 # ==================== 和弦类型和构建 ====================
 
@@ -212,7 +235,47 @@ class ChordQuality(Enum):
     MINOR_THIRTEENTH = "m13"   # 小十三和弦
     DOMINANT_THIRTEENTH = "13" # 属十三和弦
 
-def get_chord_intervals(quality: ChordQuality) -> List[int]:
+# 各和弦性质相对于根音的半音间隔
+_CHORD_INTERVALS = {
+    # 三和弦
+    ChordQuality.MAJOR: (0, 4, 7),
+    ChordQuality.MINOR: (0, 3, 7),
+    ChordQuality.DIMINISHED: (0, 3, 6),
+    ChordQuality.AUGMENTED: (0, 4, 8),
+    ChordQuality.SUSPENDED2: (0, 2, 7),
+    ChordQuality.SUSPENDED4: (0, 5, 7),
+
+    # 七和弦
+    ChordQuality.MAJOR_SEVENTH: (0, 4, 7, 11),
+    ChordQuality.MINOR_SEVENTH: (0, 3, 7, 10),
+    ChordQuality.DOMINANT_SEVENTH: (0, 4, 7, 10),
+    ChordQuality.DIMINISHED_SEVENTH: (0, 3, 6, 9),
+    ChordQuality.HALF_DIMINISHED_SEVENTH: (0, 3, 6, 10),
+    ChordQuality.MINOR_MAJOR_SEVENTH: (0, 3, 7, 11),
+    ChordQuality.AUGMENTED_MAJOR_SEVENTH: (0, 4, 8, 11),
+    ChordQuality.AUGMENTED_SEVENTH: (0, 4, 8, 10),
+
+    # 九和弦
+    ChordQuality.MAJOR_NINTH: (0, 4, 7, 11, 14),
+    ChordQuality.MINOR_NINTH: (0, 3, 7, 10, 14),
+    ChordQuality.DOMINANT_NINTH: (0, 4, 7, 10, 14),
+    ChordQuality.MINOR_MAJOR_NINTH: (0, 3, 7, 11, 14),
+
+    # 十一和弦
+    ChordQuality.MAJOR_ELEVENTH: (0, 4, 7, 11, 14, 17),
+    ChordQuality.MINOR_ELEVENTH: (0, 3, 7, 10, 14, 17),
+    ChordQuality.DOMINANT_ELEVENTH: (0, 4, 7, 10, 14, 17),
+
+    # 十三和弦
+    ChordQuality.MAJOR_THIRTEENTH: (0, 4, 7, 11, 14, 17, 21),
+    ChordQuality.MINOR_THIRTEENTH: (0, 3, 7, 10, 14, 17, 21),
+    ChordQuality.DOMINANT_THIRTEENTH: (0, 4, 7, 10, 14, 17, 21),
+}
+
+# 未知和弦性质时的默认间隔（大三和弦）
+_DEFAULT_CHORD_INTERVALS = _CHORD_INTERVALS[ChordQuality.MAJOR]
+
+def get_chord_intervals(quality: ChordQuality) -> Tuple[int, ...]:
     """
     获取和弦性质的半音间隔
 
@@ -220,50 +283,14 @@ def get_chord_intervals(quality: ChordQuality) -> List[int]:
         quality: 和弦性质
 
     返回:
-        半音间隔列表，相对于根音
-    """
-    chord_intervals = {
-        # 三和弦
-        ChordQuality.MAJOR: [0, 4, 7],
-        ChordQuality.MINOR: [0, 3, 7],
-        ChordQuality.DIMINISHED: [0, 3, 6],
-        ChordQuality.AUGMENTED: [0, 4, 8],
-        ChordQuality.SUSPENDED2: [0, 2, 7],
-        ChordQuality.SUSPENDED4: [0, 5, 7],
-
-        # 七和弦
-        ChordQuality.MAJOR_SEVENTH: [0, 4, 7, 11],
-        ChordQuality.MINOR_SEVENTH: [0, 3, 7, 10],
-        ChordQuality.DOMINANT_SEVENTH: [0, 4, 7, 10],
-        ChordQuality.DIMINISHED_SEVENTH: [0, 3, 6, 9],
-        ChordQuality.HALF_DIMINISHED_SEVENTH: [0, 3, 6, 10],
-        ChordQuality.MINOR_MAJOR_SEVENTH: [0, 3, 7, 11],
-        ChordQuality.AUGMENTED_MAJOR_SEVENTH: [0, 4, 8, 11],
-        ChordQuality.AUGMENTED_SEVENTH: [0, 4, 8, 10],
-
-        # 九和弦
-        ChordQuality.MAJOR_NINTH: [0, 4, 7, 11, 14],
-        ChordQuality.MINOR_NINTH: [0, 3, 7, 10, 14],
-        ChordQuality.DOMINANT_NINTH: [0, 4, 7, 10, 14],
-        ChordQuality.MINOR_MAJOR_NINTH: [0, 3, 7, 11, 14],
-
-        # 十一和弦
-        ChordQuality.MAJOR_ELEVENTH: [0, 4, 7, 11, 14, 17],
-        ChordQuality.MINOR_ELEVENTH: [0, 3, 7, 10, 14, 17],
-        ChordQuality.DOMINANT_ELEVENTH: [0, 4, 7, 10, 14, 17],
-
-        # 十三和弦
-        ChordQuality.MAJOR_THIRTEENTH: [0, 4, 7, 11, 14, 17, 21],
-        ChordQuality.MINOR_THIRTEENTH: [0, 3, 7, 10, 14, 17, 21],
-        ChordQuality.DOMINANT_THIRTEENTH: [0, 4, 7, 10, 14, 17, 21],
-    }
-
-    return chord_intervals.get(quality, [0, 4, 7])
+        半音间隔元组，相对于根音
+    """
+    return _CHORD_INTERVALS.get(quality, _DEFAULT_CHORD_INTERVALS)
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Chord:
     """
-    和弦数据类
+    和弦数据类（不可变，可在调用方之间安全共享）
 
     属性:
         root: 根音在音阶中的级数 (0-6)，0为主音
@@ -276,7 +303,7 @@ class Chord:
     inversion: int = 0
     bass_note: Optional[int] = None
 
-    def get_midi_notes(self, key: Key, octave: int = 4) -> List[int]:
+    def get_midi_notes(self, key: Key, octave: int = 4) -> Tuple[int, ...]:
         """
         计算实际的MIDI音符
 
@@ -285,35 +312,9 @@ class Chord:
             octave: 八度
 
         返回:
-            MIDI音符编号列表
+            MIDI音符编号元组（按参数缓存，调用方共享）
         """
-        # 获取音阶音符
-        scale_notes = get_scale_notes(key, octave=octave, num_octaves=2)
-
-        # 获取根音
-        if self.root < len(scale_notes):
-            root_note = scale_notes[self.root]
-        else:
-            root_note = scale_notes[0] + self.root * 2  # 近似计算
-
-        # 获取和弦间隔
-        intervals = get_chord_intervals(self.quality)
-
-        # 计算和弦音符
-        chord_notes = [root_note + interval for interval in intervals]
-
-        # 处理转位
-        if self.inversion > 0:
-            # 将最低音上移一个八度
-            inversion_count = min(self.inversion, len(chord_notes) - 1)
-            for i in range(inversion_count):
-                chord_notes[i] += 12
-
-        # 如果有指定的低音，确保低音在最低位置
-        if self.bass_note is not None:
-            chord_notes = [self.bass_note] + [note for note in chord_notes if note != self.bass_note]
-
-        return chord_notes
+        return _chord_midi_notes(self.root, self.quality, self.inversion, self.bass_note, key, octave)
 
     def get_chord_name(self, key: Key) -> str:
         """
@@ -326,8 +327,7 @@ class Chord:
             和弦名称字符串
         """
         # 获取音级名称
-        scale_degrees = ["I", "II", "III", "IV", "V", "VI", "VII"]
-        degree = scale_degrees[self.root % 7]
+        degree = SCALE_DEGREE_NAMES[self.root % 7]
 
         # 转位标记
         inversion_suffix = ""
@@ -338,6 +338,49 @@ class Chord:
 
         return f"{degree}{self.quality.value}{inversion_suffix}"
 
+@lru_cache(maxsize=4096)
+def _chord_midi_notes(root: int, quality: ChordQuality, inversion: int,
+                      bass_note: Optional[int], key: Key, octave: int) -> Tuple[int, ...]:
+    """Chord.get_midi_notes 的计算实现，按和弦字段、调和八度缓存"""
+    # 获取音阶音符
+    scale_notes = get_scale_notes(key, octave=octave, num_octaves=2)
+
+    # 获取根音
+    if root < len(scale_notes):
+        root_note = scale_notes[root]
+    else:
+        root_note = scale_notes[0] + root * 2  # 近似计算
+
+    # 获取和弦间隔
+    intervals = get_chord_intervals(quality)
+
+    # 计算和弦音符，转位时最低的若干个音在同一次遍历中上移一个八度
+    inversion_count = min(inversion, len(intervals) - 1)
+    chord_notes = [root_note + interval + 12 if i < inversion_count else root_note + interval
+                   for i, interval in enumerate(intervals)]
+
+    # 如果有指定的低音，确保低音在最低位置
+    if bass_note is not None:
+        chord_notes = [bass_note] + [note for note in chord_notes if note != bass_note]
+
+    return tuple(chord_notes)
+
+def get_progression_midi_notes(chords: Sequence[Chord], key: Key, octave: int = 4) -> List[Tuple[int, ...]]:
+    """
+    批量计算整个和弦进行的MIDI音符
+
+    参数:
+        chords: 和弦序列
+        key: 调
+        octave: 八度
+
+    返回:
+        与和弦一一对应的MIDI音符元组列表，相同和弦共享同一个元组
+    """
+    chord_midi_notes = _chord_midi_notes
+    return [chord_midi_notes(chord.root, chord.quality, chord.inversion, chord.bass_note, key, octave)
+            for chord in chords]
+
 # ==================== 音级和和弦分析 ====================
 
 class ScaleDegree(Enum):
@@ -350,6 +393,36 @@ class ScaleDegree(Enum):
     SUBMEDIANT = 6   # 下中音 (VI)
     SUBTONIC = 7     # 导音 (VII)
 
+# 大调和弦等级性质
+MAJOR_DIATONIC_QUALITIES = (
+    ChordQuality.MAJOR,        # I
+    ChordQuality.MINOR,        # II
+    ChordQuality.MINOR,        # III
+    ChordQuality.MAJOR,        # IV
+    ChordQuality.MAJOR,        # V
+    ChordQuality.MINOR,        # VI
+    ChordQuality.DIMINISHED    # VII
+)
+
+# 小调和弦等级性质
+MINOR_DIATONIC_QUALITIES = (
+    ChordQuality.MINOR,        # I
+    ChordQuality.DIMINISHED,   # II
+    ChordQuality.MAJOR,        # III
+    ChordQuality.MINOR,        # IV
+    ChordQuality.MINOR,        # V
+    ChordQuality.MAJOR,        # VI
+    ChordQuality.MAJOR         # VII (和声小调)
+)
+
+# 调内自然和弦原型，按级数 0-6 索引；Chord 不可变，直接共享
+_MAJOR_DIATONIC_CHORDS = tuple(
+    Chord(root=root, quality=quality) for root, quality in enumerate(MAJOR_DIATONIC_QUALITIES)
+)
+_MINOR_DIATONIC_CHORDS = tuple(
+    Chord(root=root, quality=quality) for root, quality in enumerate(MINOR_DIATONIC_QUALITIES)
+)
+
 def get_diatonic_chord(degree: int, key: Key, quality_type: str = "major") -> Chord:
     """
     获取调内自然和弦
@@ -362,37 +435,12 @@ def get_diatonic_chord(degree: int, key: Key, quality_type: str = "major") -> Ch
     返回:
         调内和弦
     """
-    # 大调和弦等级性质
-    major_qualities = [
-        ChordQuality.MAJOR,        # I
-        ChordQuality.MINOR,        # II
-        ChordQuality.MINOR,        # III
-        ChordQuality.MAJOR,        # IV
-        ChordQuality.MAJOR,        # V
-        ChordQuality.MINOR,        # VI
-        ChordQuality.DIMINISHED    # VII
-    ]
-
-    # 小调和弦等级性质
-    minor_qualities = [
-        ChordQuality.MINOR,        # I
-        ChordQuality.DIMINISHED,   # II
-        ChordQuality.MAJOR,        # III
-        ChordQuality.MINOR,        # IV
-        ChordQuality.MINOR,        # V
-        ChordQuality.MAJOR,        # VI
-        ChordQuality.MAJOR         # VII (和声小调)
-    ]
-
     if quality_type == "major" or not key.is_minor:
-        qualities = major_qualities
+        chords = _MAJOR_DIATONIC_CHORDS
     else:
-        qualities = minor_qualities
-
-    root = (degree - 1) % 7
-    quality = qualities[root]
+        chords = _MINOR_DIATONIC_CHORDS
 
-    return Chord(root=root, quality=quality)
+    return chords[(degree - 1) % 7]
 
 # ==================== 和弦进行模式 ====================
 
@@ -405,8 +453,8 @@ class ChordProgression:
     style: str = "general"  # 风格标记
     complexity: int = 1     # 复杂度等级 (1-5)
 
-# 经典和弦进行库
-CHORD_PROGRESSIONS = {
+# 经典和弦进行库（可写的底层字典，只通过 register_progression 修改）
+_CHORD_PROGRESSIONS: Dict[str, ChordProgression] = {
     # 流行音乐进行
     "pop_basic": ChordProgression(
         name="pop_basic",
@@ -506,6 +554,9 @@ CHORD_PROGRESSIONS = {
     )
 }
 
+# 对外公开的只读视图：风格索引与候选缓存依赖进行库内容，直接修改会使缓存失效而不自知
+CHORD_PROGRESSIONS = MappingProxyType(_CHORD_PROGRESSIONS)
+
 def get_progression_by_name(name: str) -> Optional[ChordProgression]:
     """
     根据名称获取和弦进行
@@ -518,7 +569,15 @@ def get_progression_by_name(name: str) -> Optional[ChordProgression]:
     """
     return CHORD_PROGRESSIONS.get(name)
 
-def get_progressions_by_style(style: str) -> List[ChordProgression]:
+@lru_cache(maxsize=None)
+def _progressions_by_style() -> Dict[str, Tuple[ChordProgression, ...]]:
+    """按风格对和弦进行库分桶，保持库中的顺序；首次使用时构建，进行库变化时由 register_progression 清除"""
+    buckets: Dict[str, List[ChordProgression]] = {}
+    for prog in _CHORD_PROGRESSIONS.values():
+        buckets.setdefault(prog.style, []).append(prog)
+    return {style: tuple(progs) for style, progs in buckets.items()}
+
+def get_progressions_by_style(style: str) -> Tuple[ChordProgression, ...]:
     """
     根据风格获取和弦进行列表
 
@@ -526,9 +585,29 @@ def get_progressions_by_style(style: str) -> List[ChordProgression]:
         style: 风格名称
 
     返回:
-        该风格的和弦进行列表
+        该风格的和弦进行元组（共享的只读索引）
     """
-    return [prog for prog in CHORD_PROGRESSIONS.values() if prog.style == style]
+    return _progressions_by_style().get(style, ())
+
+@lru_cache(maxsize=32)
+def _progression_candidates(style: Optional[str], max_complexity: int) -> Tuple[ChordProgression, ...]:
+    """按风格和最大复杂度过滤和弦进行，结果按参数缓存，进行库变化时由 register_progression 清除"""
+    if style:
+        candidates = get_progressions_by_style(style)
+    else:
+        candidates = _CHORD_PROGRESSIONS.values()
+    return tuple(prog for prog in candidates if prog.complexity <= max_complexity)
+
+def register_progression(progression: ChordProgression) -> None:
+    """
+    向进行库添加和弦进行，同名进行会被替换
+
+    参数:
+        progression: 和弦进行对象，注册后不应再修改其字段
+    """
+    _CHORD_PROGRESSIONS[progression.name] = progression
+    _progressions_by_style.cache_clear()
+    _progression_candidates.cache_clear()
 
 def get_random_progression(style: Optional[str] = None,
                           max_complexity: int = 5) -> ChordProgression:
@@ -542,12 +621,7 @@ def get_random_progression(style: Optional[str] = None,
     返回:
         随机和弦进行
     """
-    if style:
-        candidates = [prog for prog in CHORD_PROGRESSIONS.values()
-                     if prog.style == style and prog.complexity <= max_complexity]
-    else:
-        candidates = [prog for prog in CHORD_PROGRESSIONS.values()
-                     if prog.complexity <= max_complexity]
+    candidates = _progression_candidates(style, max_complexity)
 
     return random.choice(candidates) if candidates else CHORD_PROGRESSIONS["pop_basic"]
 
@@ -560,6 +634,35 @@ class VoiceLeading(Enum):
     MIXED = "mixed"       # 混合排列
     SMOOTH = "smooth"     # 平滑连接（最小化声部移动）
 
+# 转位移位表：第 k 转位时前 k 个音上移一个八度，覆盖最多 7 个音的和弦
+_INVERSION_SHIFTS = tuple(
+    tuple(12 if index < inversion else 0 for index in range(7))
+    for inversion in range(7)
+)
+
+def _best_inversion(previous_notes: Sequence[int], candidates: Sequence[Sequence[int]]) -> int:
+    """
+    声部连接数值核心：返回与前一和弦总移动距离最小的候选下标
+    只处理整数序列，距离相同时取较小的下标
+
+    参数:
+        previous_notes: 前一和弦的音符
+        candidates: 各转位的音符序列
+
+    返回:
+        最佳候选的下标
+    """
+    best_index = 0
+    min_movement = -1
+    for index, notes in enumerate(candidates):
+        movement = 0
+        for test, prev in zip(notes, previous_notes):
+            movement += abs(test - prev)
+        if min_movement < 0 or movement < min_movement:
+            min_movement = movement
+            best_index = index
+    return best_index
+
 def apply_voice_leading(chords: List[Chord], key: Key,
                        strategy: VoiceLeading = VoiceLeading.SMOOTH) -> List[Chord]:
     """
@@ -575,39 +678,54 @@ def apply_voice_leading(chords: List[Chord], key: Key,
     """
     if strategy == VoiceLeading.SMOOTH and len(chords) > 1:
         # 平滑连接：最小化声部移动
+        # 同一 (根音, 性质) 各转位的音符只计算一次，在整个进行中复用
+        inversion_notes = {}
+        chord_midi_notes = _chord_midi_notes
         previous_notes = chords[0].get_midi_notes(key)
 
         for i in range(1, len(chords)):
-            current_notes = chords[i].get_midi_notes(key)
-
-            # 寻找最佳转位以最小化音程移动
-            min_movement = float('inf')
-            best_inversion = chords[i].inversion
-
-            for inversion in range(4):  # 尝试不同转位
-                test_chord = Chord(
-                    root=chords[i].root,
-                    quality=chords[i].quality,
-                    inversion=inversion
+            chord = chords[i]
+            candidates = inversion_notes.get((chord.root, chord.quality))
+            if candidates is None:
+                # 原位音符只取一次，各转位由移位表叠加得到
+                base_notes = chord_midi_notes(chord.root, chord.quality, 0, None, key, 4)
+                max_inversion = len(base_notes) - 1
+                candidates = tuple(
+                    tuple(note + shift for note, shift in
+                          zip(base_notes, _INVERSION_SHIFTS[min(inversion, max_inversion)]))
+                    for inversion in range(4)  # 尝试不同转位
                 )
-                test_notes = test_chord.get_midi_notes(key)
-
-                # 计算总移动距离
-                movement = sum(abs(test_notes[j] - previous_notes[j])
-                             for j in range(min(len(test_notes), len(previous_notes))))
+                inversion_notes[(chord.root, chord.quality)] = candidates
 
-                if movement < min_movement:
-                    min_movement = movement
-                    best_inversion = inversion
+            # 寻找最佳转位以最小化音程移动
+            best_inversion = _best_inversion(previous_notes, candidates)
 
-            # 应用最佳转位
-            chords[i].inversion = best_inversion
-            previous_notes = chords[i].get_midi_notes(key)
+            # 应用最佳转位（Chord 不可变，替换为新对象）
+            chords[i] = replace(chord, inversion=best_inversion)
+            if chord.bass_note is None:
+                previous_notes = candidates[best_inversion]
+            else:
+                previous_notes = chords[i].get_midi_notes(key)
 
     return chords
 
 # ==================== 音乐分析和工具函数 ====================
 
+def pitch_class_mask(notes) -> int:
+    """
+    将音符集合转换为 12 位音级掩码
+
+    参数:
+        notes: MIDI音符序列
+
+    返回:
+        整数掩码，音级 n 出现时第 n 位为 1
+    """
+    mask = 0
+    for note in notes:
+        mask |= 1 << (note % 12)
+    return mask
+
 def analyze_melody_congruence(melody_notes: List[int], chord: Chord, key: Key) -> float:
     """
     分析旋律与和弦的协和程度
@@ -620,22 +738,24 @@ def analyze_melody_congruence(melody_notes: List[int], chord: Chord, key: Key) -
     返回:
         协和度分数 (0.0-1.0)
     """
-    chord_notes = set(chord.get_midi_notes(key))
-    scale_notes = set(get_scale_notes(key))
+    # 音级集合用 12 位掩码表示，第 n 位对应音级 n
+    chord_mask = pitch_class_mask(chord.get_midi_notes(key))
+    scale_mask = pitch_class_mask(get_scale_notes(key))
 
     congruent_count = 0
 
     for note in melody_notes:
+        bit = 1 << (note % 12)
         # 检查是否在和弦音上
-        if note % 12 in {cn % 12 for cn in chord_notes}:
+        if bit & chord_mask:
             congruent_count += 1
         # 检查是否在调内音上
-        elif note % 12 in {sn % 12 for sn in scale_notes}:
+        elif bit & scale_mask:
             congruent_count += 0.5
 
     return congruent_count / len(melody_notes) if melody_notes else 0.0
 
-def get_suitable_chords_for_note(note: int, key: Key) -> List[Chord]:
+def get_suitable_chords_for_note(note: int, key: Key) -> Tuple[Chord, ...]:
     """
     获取适合指定音符的调内和弦
 
@@ -644,19 +764,31 @@ def get_suitable_chords_for_note(note: int, key: Key) -> List[Chord]:
         key: 调
 
     返回:
-        包含该音符的调内和弦列表
+        包含该音符的调内和弦元组（共享的只读结果）
     """
-    suitable_chords = []
+    return _diatonic_chords_by_pitch_class(key)[note % 12]
 
-    # 检查所有调内和弦
+@lru_cache(maxsize=None)
+def _diatonic_chords_by_pitch_class(key: Key) -> Tuple[Tuple[Chord, ...], ...]:
+    """
+    按音级 (0-11) 索引的调内和弦表，每项为包含该音级的调内和弦
+    每个调只计算一次 7 个和弦的音级掩码
+    """
+    chord_masks = []
     for degree in range(1, 8):
         chord = get_diatonic_chord(degree, key)
-        chord_notes = chord.get_midi_notes(key)
+        chord_masks.append((chord, pitch_class_mask(chord.get_midi_notes(key))))
 
-        if any(note % 12 == cn % 12 for cn in chord_notes):
-            suitable_chords.append(chord)
+    return tuple(
+        tuple(chord for chord, mask in chord_masks if mask & (1 << pitch_class))
+        for pitch_class in range(12)
+    )
 
-    return suitable_chords
+# 每个音级对应的调，取枚举中首个主音为该音级的调（同音异名时优先大调、升号调）
+_KEYS_BY_TONIC_PITCH_CLASS = tuple(
+    next(key for key in Key if _KEY_TONIC[key] % 12 == pitch_class)
+    for pitch_class in range(12)
+)
 
 def modulate(current_key: Key, target_degree: int = 5) -> Key:
     """
@@ -669,30 +801,14 @@ def modulate(current_key: Key, target_degree: int = 5) -> Key:
     返回:
         转调后的调
     """
-    # 获取当前调的主音
-    current_tonic = current_key.tonic
-
     # 获取音阶音程
     intervals = get_scale_intervals(current_key.scale_type)
 
     # 计算目标音级的音高
-    target_note = current_tonic
-    for i in range(target_degree - 1):
-        if i < len(intervals):
-            target_note += intervals[i]
-
-    # 找到最接近的调
-    all_keys = list(Key)
-    min_distance = float('inf')
-    target_key = current_key
-
-    for key in all_keys:
-        distance = abs(key.tonic - target_note)
-        if distance < min_distance:
-            min_distance = distance
-            target_key = key
-
-    return target_key
+    target_note = current_key.tonic + sum(intervals[:max(0, target_degree - 1)])
+
+    # 按音级直接查找对应的调
+    return _KEYS_BY_TONIC_PITCH_CLASS[target_note % 12]
 
 # ==================== 导出和初始化 ====================
 
@@ -20,6 +20,7 @@ __all__ = [
     "ProgressionBasedStrategy",
     "DiatonicStrategy",
     "FunctionalStrategy",
+    "MarkovProgressionStrategy",
     "HybridHarmonyStrategy",
     "HarmonyGenerator",
     "create_harmony",
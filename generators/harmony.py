@@ -7,21 +7,36 @@
 - 和弦节奏模式
 """
 
-from typing import List, Tuple, Optional, Dict, Callable
+from typing import List, Tuple, Optional, Dict, Callable, Sequence
+from functools import lru_cache
+import bisect
+import inspect
 import random
 from abc import ABC, abstractmethod
+from array import array
+from dataclasses import replace
 from core.theory import (
     Key, Chord, ChordQuality, ChordProgression,
     CHORD_PROGRESSIONS, get_progression_by_name,
     get_progressions_by_style, get_random_progression,
-    get_diatonic_chord, get_scale_notes, VoiceLeading, apply_voice_leading
+    get_diatonic_chord, get_scale_notes, VoiceLeading, apply_voice_leading,
+    get_progression_midi_notes
 )
 
+# ==================== 辅助函数：和弦根音缓存 ====================
+
+@lru_cache(maxsize=512)
+def _chord_root_midi(chord: Chord, key: Key) -> int:
+    """和弦根音（最低音）的MIDI编号，按 (和弦, 调) 缓存，各策略共享"""
+    return chord.get_midi_notes(key)[0]
+
 # ==================== 和弦生成策略抽象基类 ====================
 
 class HarmonyStrategy(ABC):
     """和声生成策略抽象基类"""
 
+    __slots__ = ("key", "beats_per_bar")
+
     def __init__(self, key: Key, beats_per_bar: int = 4):
         """
         初始化和声生成策略
@@ -47,14 +62,23 @@ class HarmonyStrategy(ABC):
         """
         pass
 
+    def generate_arrays(self, num_bars: int, **kwargs) -> Tuple[array, array]:
+        """
+        以结构数组形式生成和弦序列
+
+        Args:
+            num_bars: 小节数量
+            **kwargs: 与 generate 相同的参数
+
+        Returns:
+            (根音MIDI编号数组 array('h'), 时值数组 array('d'))
+        """
+        sequence = self.generate(num_bars, **kwargs)
+        return array('h', [root for root, _ in sequence]), array('d', [duration for _, duration in sequence])
+
     def _apply_inversion(self, chord: Chord, inversion: int) -> Chord:
-        """应用和弦转位"""
-        return Chord(
-            root=chord.root,
-            quality=chord.quality,
-            inversion=inversion,
-            bass_note=chord.bass_note
-        )
+        """应用和弦转位（Chord 是不可变数据类，直接替换转位字段）"""
+        return replace(chord, inversion=inversion)
 
 # ==================== 辅助函数：平行五八度检测与处理 ====================
 
@@ -108,6 +132,43 @@ def adjust_voicing_to_avoid_parallels(chord: Chord, key: Key) -> Chord:
     # 如果所有转位都无法避免，返回原和弦
     return chord
 
+@lru_cache(maxsize=1024)
+def _best_transition(prev_chord: Chord, root: int, quality: ChordQuality, key: Key) -> Chord:
+    """
+    在前一和弦固定时，为当前和弦选出惩罚最小的转位（0-3），同分取较低转位
+
+    Returns:
+        选定转位的和弦（不保留指定低音）
+    """
+    prev_notes = prev_chord.get_midi_notes(key)
+
+    best_curr_chord = None
+    min_penalty = float('inf')
+
+    # 尝试当前和弦的不同转位
+    for inversion in range(4):  # 尝试0-3转位
+        test_chord = Chord(root=root, quality=quality, inversion=inversion)
+        curr_notes = test_chord.get_midi_notes(key)
+
+        # 计算惩罚：1) 总音程移动（平滑性） 2) 平行五八度（规则惩罚）
+        # 1. 计算总移动距离
+        movement = sum(abs(curr_notes[j] - prev_notes[j]) for j in range(min(len(prev_notes), len(curr_notes))))
+
+        # 2. 检测平行五八度
+        parallel_penalty = 0
+        if has_parallel_fifths(prev_notes, curr_notes):
+            parallel_penalty += 10  # 大幅惩罚平行五度
+        if has_parallel_octaves(prev_notes, curr_notes):
+            parallel_penalty += 10  # 大幅惩罚平行八度
+
+        total_penalty = movement + parallel_penalty * 10  # 给予平行五八度更高权重
+
+        if total_penalty < min_penalty:
+            min_penalty = total_penalty
+            best_curr_chord = test_chord
+
+    return best_curr_chord
+
 def apply_improved_voice_leading(chords: List[Chord], key: Key, strategy: VoiceLeading = VoiceLeading.SMOOTH) -> List[Chord]:
     """
     应用改进的声部连接策略。
@@ -128,47 +189,24 @@ def apply_improved_voice_leading(chords: List[Chord], key: Key, strategy: VoiceL
     # 第一个和弦保持原样或可以优化其排列
     improved_chords.append(chords[0])
     
+    # 相邻和弦对在重复的进行中反复出现，最优转位按 (前一和弦, 当前根音, 当前性质, 调) 缓存
     for i in range(1, len(chords)):
-        prev_chord = improved_chords[i-1]
         curr_chord = chords[i]
-        prev_notes = prev_chord.get_midi_notes(key)
-        
-        best_curr_chord = curr_chord
-        min_penalty = float('inf')
-        
-        # 尝试当前和弦的不同转位
-        for inversion in range(4):  # 尝试0-3转位
-            test_chord = Chord(
-                root=curr_chord.root,
-                quality=curr_chord.quality,
-                inversion=inversion
-            )
-            curr_notes = test_chord.get_midi_notes(key)
-            
-            # 计算惩罚：1) 总音程移动（平滑性） 2) 平行五八度（规则惩罚）
-            # 1. 计算总移动距离
-            movement = sum(abs(curr_notes[j] - prev_notes[j]) for j in range(min(len(prev_notes), len(curr_notes))))
-            
-            # 2. 检测平行五八度
-            parallel_penalty = 0
-            if has_parallel_fifths(prev_notes, curr_notes):
-                parallel_penalty += 10  # 大幅惩罚平行五度
-            if has_parallel_octaves(prev_notes, curr_notes):
-                parallel_penalty += 10  # 大幅惩罚平行八度
-            
-            total_penalty = movement + parallel_penalty * 10  # 给予平行五八度更高权重
-            
-            if total_penalty < min_penalty:
-                min_penalty = total_penalty
-                best_curr_chord = test_chord
-        
+        best_curr_chord = _best_transition(improved_chords[i-1], curr_chord.root, curr_chord.quality, key)
         improved_chords.append(best_curr_chord)
     
     return improved_chords
 
+def _is_single_plain_chord(chords: List[Chord]) -> bool:
+    """判断和弦列表是否由同一个未指定低音的和弦重复构成（此时声部连接是恒等变换）"""
+    distinct = {(chord.root, chord.quality, chord.inversion, chord.bass_note) for chord in chords}
+    return len(distinct) <= 1 and all(chord.bass_note is None for chord in chords[:1])
+
 class ProgressionBasedStrategy(HarmonyStrategy):
     """基于预设和弦进行的策略"""
 
+    __slots__ = ("progression", "_base_chords", "_base_roots")
+
     def __init__(
         self,
         key: Key,
@@ -189,6 +227,15 @@ class ProgressionBasedStrategy(HarmonyStrategy):
         else:
             self.progression = get_random_progression()
 
+        # 进行中的和弦对象及其根音在构造时确定，生成时按下标复用（Chord 不可变）
+        if self.progression:
+            self._base_chords = tuple(Chord(root=degree - 1, quality=quality)
+                                      for degree, quality in self.progression.chords)
+            self._base_roots = tuple(_chord_root_midi(chord, key) for chord in self._base_chords)
+        else:
+            self._base_chords = ()
+            self._base_roots = ()
+
     def generate(
         self,
         num_bars: int,
@@ -211,41 +258,83 @@ class ProgressionBasedStrategy(HarmonyStrategy):
         Returns:
             [(根音MIDI, 时值), ...]
         """
+        roots, durations = self._generate_columns(
+            num_bars, chords_per_bar, rhythm, apply_voice_leading_flag, inversion_mode
+        )
+
+        # 返回 (根音MIDI, 时值) 列表
+        return list(zip(roots, durations))
+
+    def generate_arrays(
+        self,
+        num_bars: int,
+        chords_per_bar: int = 1,
+        rhythm: str = "steady",
+        apply_voice_leading_flag: bool = False,
+        inversion_mode: str = "none",
+        **kwargs
+    ) -> Tuple[array, array]:
+        """以两列数组返回和弦序列，不构建 (根音, 时值) 元组列表"""
+        roots, durations = self._generate_columns(
+            num_bars, chords_per_bar, rhythm, apply_voice_leading_flag, inversion_mode
+        )
+        return array('h', roots), array('d', durations)
+
+    def _generate_columns(
+        self,
+        num_bars: int,
+        chords_per_bar: int,
+        rhythm: str,
+        apply_voice_leading_flag: bool,
+        inversion_mode: str
+    ) -> Tuple[List[int], List[float]]:
+        """生成和弦序列的根音列与时值列，generate 与 generate_arrays 共用"""
         if not self.progression:
             raise ValueError("No chord progression available")
 
-        # 构建和弦对象列表
+        # 构建和弦对象列表，同时记录每个和弦的最低音
         chords = []
-        progression_chords = self.progression.chords
+        roots = []
+        key = self.key
+        base_chords = self._base_chords
+        base_roots = self._base_roots
+        num_base_chords = len(base_chords)
 
         # 重复进行以填充小节数
         total_chords = num_bars * chords_per_bar
-        chord_index = 0
 
-        for _ in range(total_chords):
-            degree, quality = progression_chords[chord_index % len(progression_chords)]
-            chord = Chord(root=degree - 1, quality=quality)
+        # 随机转位模式下一次性抽取所有和弦的转位，避免在循环中逐个调用 random
+        if inversion_mode == "random":
+            random_inversions = random.choices((0, 1, 2), k=total_chords)
+
+        for chord_index in range(total_chords):
+            base_index = chord_index % num_base_chords
+            chord = base_chords[base_index]
+            root = base_roots[base_index]
 
-            # 应用转位
+            # 应用转位，转位后的最低音从缓存中读取
             if inversion_mode == "random":
-                chord = self._apply_inversion(chord, random.randint(0, 2))
+                chord = self._apply_inversion(chord, random_inversions[chord_index])
+                root = _chord_root_midi(chord, key)
             elif inversion_mode == "bass_motion":
                 # 基于低音走向的转位（简化版）
-                if chords:
-                    prev_bass = chords[-1][0]
-                    current_bass = chord.get_midi_notes(self.key)[0]
+                if roots:
+                    prev_bass = roots[-1]
                     # 如果低音跳动太大，考虑转位
-                    if abs(current_bass - prev_bass) > 7:
+                    if abs(root - prev_bass) > 7:
                         chord = self._apply_inversion(chord, random.randint(1, 2))
+                        root = _chord_root_midi(chord, key)
 
             chords.append(chord)
-            chord_index += 1
+            roots.append(root)
 
-        # 应用声部连接
-        if apply_voice_leading_flag:
+        # 应用声部连接；整段只有同一个和弦（且无指定低音）时声部连接不会改变结果，直接跳过
+        if apply_voice_leading_flag and not _is_single_plain_chord(chords):
             #chords = apply_voice_leading(chords, self.key, VoiceLeading.SMOOTH)
             # 使用改进的声部连接策略，它会自动在平滑移动和避免平行五八度之间寻找最优解
-            chords = apply_improved_voice_leading(chords, self.key, VoiceLeading.SMOOTH)
+            chords = apply_improved_voice_leading(chords, key, VoiceLeading.SMOOTH)
+            # 声部连接会改变转位，整个进行的最低音重新批量计算
+            roots = [notes[0] for notes in get_progression_midi_notes(chords, key)]
 
         # 计算每个和弦的时值
         beats_per_chord = self.beats_per_bar / chords_per_bar
@@ -254,41 +343,83 @@ class ProgressionBasedStrategy(HarmonyStrategy):
         if rhythm == "steady":
             durations = [beats_per_chord] * total_chords
         elif rhythm == "syncopated":
-            # 简单的切分模式
-            durations = []
-            for i in range(total_chords):
-                if i % 2 == 1:
-                    durations.append(beats_per_chord * 0.5)
-                else:
-                    durations.append(beats_per_chord * 1.5)
+            # 简单的切分模式：长短交替，整段由两拍模板重复后截断得到
+            durations = [beats_per_chord * 1.5, beats_per_chord * 0.5] * ((total_chords + 1) // 2)
+            del durations[total_chords:]
         elif rhythm == "random":
-            durations = []
-            for i in range(total_chords):
-                # 在0.5倍到1.5倍之间随机
-                factor = random.uniform(0.5, 1.5)
-                durations.append(beats_per_chord * factor)
+            # 在0.5倍到1.5倍之间随机，随机数一次性按和弦数抽取
+            uniform = random.uniform
+            durations = [beats_per_chord * uniform(0.5, 1.5) for _ in range(total_chords)]
         else:
             durations = [beats_per_chord] * total_chords
 
-        # 返回 (根音MIDI, 时值) 列表
-        result = []
-        for chord, duration in zip(chords, durations):
-            root_note = chord.get_midi_notes(self.key)[0]
-            result.append((root_note, duration))
+        return roots, durations
 
-        return result
 
+@lru_cache(maxsize=48)
+def _diatonic_table(key: Key) -> Tuple[Tuple[Chord, ...], Tuple[int, ...]]:
+    """调内 7 个和弦及其根音MIDI编号，按调缓存"""
+    chords = tuple(get_diatonic_chord(degree, key) for degree in range(1, 8))
+    roots = tuple(_chord_root_midi(chord, key) for chord in chords)
+    return chords, roots
+
+# 调内和弦策略可选的和弦时值（拍）
+_DIATONIC_DURATION_CHOICES = (0.5, 1.0, 2.0, 4.0)
+
+def _sample_diatonic(total_beats: float, density: float, avoid_repetition: bool,
+                     rng) -> Tuple[List[int], List[float]]:
+    """
+    调内和弦采样核心，只处理数字，不涉及和弦对象
+
+    Args:
+        total_beats: 总拍数
+        density: 每个采样点插入和弦的概率
+        avoid_repetition: 是否避免连续重复相同和弦
+        rng: 随机数源（random 模块或 random.Random 实例）
+
+    Returns:
+        (和弦级数下标列表 0-6, 时值列表)
+    """
+    rand = rng.random
+    choice = rng.choice
+    randrange = rng.randrange
+    chord_indices = []
+    durations = []
+    last_chord_index = -1
+    current_beat = 0
+
+    while current_beat < total_beats:
+        # 检查是否应该插入和弦
+        if rand() < density:
+            # 避免重复：在其余 6 个下标中抽取，抽到不小于上一个下标时顺延一位
+            if avoid_repetition and last_chord_index >= 0:
+                chord_index = randrange(6)
+                if chord_index >= last_chord_index:
+                    chord_index += 1
+            else:
+                chord_index = rng.randint(0, 6)
+
+            # 随机时值，确保不超过剩余拍数
+            duration = min(choice(_DIATONIC_DURATION_CHOICES), total_beats - current_beat)
+
+            chord_indices.append(chord_index)
+            durations.append(duration)
+            last_chord_index = chord_index
+            current_beat += duration
+        else:
+            current_beat += 0.5  # 跳过半拍
+
+    return chord_indices, durations
 
 class DiatonicStrategy(HarmonyStrategy):
     """基于调内和弦的随机生成策略"""
 
+    __slots__ = ("diatonic_chords", "diatonic_roots")
+
     def __init__(self, key: Key, beats_per_bar: int = 4):
         super().__init__(key, beats_per_bar)
-        # 预计算调内和弦
-        self.diatonic_chords = [
-            get_diatonic_chord(degree, key)
-            for degree in range(1, 8)
-        ]
+        # 调内和弦及其根音按调缓存，同一调的实例共享，生成循环中直接按下标读取
+        self.diatonic_chords, self.diatonic_roots = _diatonic_table(key)
 
     def generate(
         self,
@@ -310,65 +441,72 @@ class DiatonicStrategy(HarmonyStrategy):
         Returns:
             [(根音MIDI, 时值), ...]
         """
+        roots, durations = self._generate_columns(num_bars, density, avoid_repetition, cadence_pattern)
+        return list(zip(roots, durations))
+
+    def generate_arrays(
+        self,
+        num_bars: int,
+        density: float = 0.5,
+        avoid_repetition: bool = True,
+        cadence_pattern: Optional[List[int]] = None,
+        **kwargs
+    ) -> Tuple[array, array]:
+        """以两列数组返回和弦序列，不构建 (根音, 时值) 元组列表"""
+        roots, durations = self._generate_columns(num_bars, density, avoid_repetition, cadence_pattern)
+        return array('h', roots), array('d', durations)
+
+    def _generate_columns(
+        self,
+        num_bars: int,
+        density: float,
+        avoid_repetition: bool,
+        cadence_pattern: Optional[List[int]]
+    ) -> Tuple[List[int], List[float]]:
+        """生成和弦序列的根音列与时值列，generate 与 generate_arrays 共用"""
         total_beats = num_bars * self.beats_per_bar
-        result = []
-        last_chord_index = -1
-        current_beat = 0
-
-        while current_beat < total_beats:
-            # 检查是否应该插入和弦
-            if random.random() < density:
-                # 避免重复
-                if avoid_repetition:
-                    available_indices = [i for i in range(7) if i != last_chord_index]
-                    chord_index = random.choice(available_indices)
-                else:
-                    chord_index = random.randint(0, 6)
+        chord_indices, durations = _sample_diatonic(total_beats, density, avoid_repetition, random)
 
-                chord = self.diatonic_chords[chord_index]
-                root_note = chord.get_midi_notes(self.key)[0]
+        diatonic_roots = self.diatonic_roots
+        roots = [diatonic_roots[index] for index in chord_indices]
 
-                # 随机时值 (1-4拍)
-                duration = random.choice([0.5, 1.0, 2.0, 4.0])
+        # 应用终止式（如果指定）：替换最后两个和弦为终止式
+        if cadence_pattern and len(cadence_pattern) >= 2 and len(roots) >= 2:
+            roots[-2] = diatonic_roots[cadence_pattern[0] - 1]
+            roots[-1] = diatonic_roots[cadence_pattern[1] - 1]
 
-                # 确保不超过剩余拍数
-                remaining = total_beats - current_beat
-                duration = min(duration, remaining)
+        return roots, durations
 
-                result.append((root_note, duration))
-                last_chord_index = chord_index
-                current_beat += duration
-            else:
-                current_beat += 0.5  # 跳过半拍
-
-        # 应用终止式（如果指定）
-        if cadence_pattern and len(cadence_pattern) >= 2:
-            # 替换最后两个和弦为终止式
-            if len(result) >= 2:
-                result[-2] = (
-                    self.diatonic_chords[cadence_pattern[0] - 1].get_midi_notes(self.key)[0],
-                    result[-2][1]
-                )
-                result[-1] = (
-                    self.diatonic_chords[cadence_pattern[1] - 1].get_midi_notes(self.key)[0],
-                    result[-1][1]
-                )
 
-        return result
+# 功能和声分类：功能 -> 可选的和弦级数下标（0-6）
+_FUNCTIONAL_GROUPS = {
+    "T": (0,),  # Tonic (I)
+    "S": (3, 4),  # Subdominant (IV, V in minor)
+    "D": (4, 6)  # Dominant (V, VII)
+}
 
+# 乐句类型 -> 功能进行
+_PHRASE_PATTERNS = {
+    "A": ("T", "S", "D", "T"),  # 主题句
+    "B": ("S", "T", "S", "D"),  # 对比句
+}
+
+# 乐句类型 -> 每个位置的候选级数，预先展开后生成时不再逐个查功能分类表
+_PHRASE_CANDIDATES = {
+    phrase: tuple(_FUNCTIONAL_GROUPS[func] for func in pattern)
+    for phrase, pattern in _PHRASE_PATTERNS.items()
+}
 
 class FunctionalStrategy(HarmonyStrategy):
     """功能和声生成策略（基于功能和声学）"""
 
-    def __init__(self, key: Key, beats_per_bar: int = 4):
-        super().__init__(key, beats_per_bar)
+    __slots__ = ()
+
+    # 定义功能和声分类（只读，所有实例共享）
+    functional_groups = _FUNCTIONAL_GROUPS
 
-        # 定义功能和声分类
-        self.functional_groups = {
-            "T": [0],  # Tonic (I)
-            "S": [3, 4],  # Subdominant (IV, V in minor)
-            "D": [4, 6]  # Dominant (V, VII)
-        }
+    # 各乐句类型对应的功能进行
+    phrase_patterns = _PHRASE_PATTERNS
 
     def generate(
         self,
@@ -386,50 +524,147 @@ class FunctionalStrategy(HarmonyStrategy):
         Returns:
             [(根音MIDI, 时值), ...]
         """
-        total_beats = num_bars * self.beats_per_bar
-        bars_per_phrase = num_bars // len(phrase_structure)
+        # 小节按乐句平均分配，除不尽的小节依次分给前面的乐句，保证总长度等于 num_bars
+        bars_per_phrase, extra_bars = divmod(num_bars, len(phrase_structure))
 
         result = []
 
-        for phrase in phrase_structure:
-            phrase_beats = bars_per_phrase * self.beats_per_bar
-            phrase_chords = self._generate_phrase(phrase, phrase_beats)
+        for phrase_index, phrase in enumerate(phrase_structure):
+            phrase_bars = bars_per_phrase + (1 if phrase_index < extra_bars else 0)
+            if phrase_bars == 0:
+                # 小节数少于乐句数时，多出的乐句没有可用的小节
+                break
+            phrase_chords = self._generate_phrase(phrase, phrase_bars * self.beats_per_bar)
             result.extend(phrase_chords)
 
         return result
 
     def _generate_phrase(self, phrase_type: str, beats: int) -> List[Tuple[int, float]]:
         """生成单个乐句的和弦"""
-        scale_notes = get_scale_notes(self.key, num_octaves=2)
-        chords = []
-        current_beat = 0
-
-        # 不同乐句类型的功能进行
-        if phrase_type == "A":
-            # 主题句：T-S-D-T
-            functional_pattern = ["T", "S", "D", "T"]
-        elif phrase_type == "B":
-            # 对比句：S-T-S-D
-            functional_pattern = ["S", "T", "S", "D"]
-        else:
-            # 随机
-            functional_pattern = ["T", "S", "D", "T"]
+        # 不同乐句类型的功能进行：主题句 T-S-D-T，对比句 S-T-S-D，其他按主题句处理
+        candidates = _PHRASE_CANDIDATES.get(phrase_type, _PHRASE_CANDIDATES["A"])
+
+        # 每个功能平分乐句时值，根音直接从按调缓存的调内和弦表中读取
+        duration = beats / len(candidates)
+        roots = _diatonic_table(self.key)[1]
+        choice = random.choice
+
+        return [(roots[choice(degrees)], duration) for degrees in candidates]
+
+
+# 默认马尔可夫转移权重：行为当前级数 I-vii（下标 0-6），列为下一级数，取自流行音乐常见的和弦走向
+_DEFAULT_MARKOV_TRANSITIONS = (
+    (0.00, 0.10, 0.05, 0.30, 0.30, 0.20, 0.05),  # I
+    (0.05, 0.00, 0.10, 0.10, 0.60, 0.05, 0.10),  # ii
+    (0.10, 0.10, 0.00, 0.30, 0.00, 0.50, 0.00),  # iii
+    (0.30, 0.10, 0.05, 0.00, 0.35, 0.15, 0.05),  # IV
+    (0.60, 0.00, 0.05, 0.10, 0.00, 0.25, 0.00),  # V
+    (0.10, 0.25, 0.10, 0.35, 0.20, 0.00, 0.00),  # vi
+    (0.80, 0.00, 0.10, 0.00, 0.00, 0.10, 0.00),  # vii
+)
 
-        for func in functional_pattern:
-            chord_degree = random.choice(self.functional_groups[func])
-            chord = get_diatonic_chord(chord_degree + 1, self.key)
-            root_note = chord.get_midi_notes(self.key)[0]
+def _cumulative_transitions(transitions: Sequence[Sequence[float]]) -> Tuple[Tuple[float, ...], ...]:
+    """把 7x7 转移权重逐行归一化为累积分布，供二分查找采样"""
+    rows = []
+    for weights in transitions:
+        total = sum(weights)
+        running = 0.0
+        cumulative = []
+        for weight in weights:
+            running += weight
+            cumulative.append(running / total)
+        rows.append(tuple(cumulative))
+    return tuple(rows)
+
+_DEFAULT_MARKOV_CUMULATIVE = _cumulative_transitions(_DEFAULT_MARKOV_TRANSITIONS)
+
+def _sample_markov(cumulative: Tuple[Tuple[float, ...], ...], count: int, state: int, rng) -> List[int]:
+    """
+    马尔可夫链采样核心，只处理整数级数下标
 
-            # 分配时值
-            duration = beats / len(functional_pattern)
-            chords.append((root_note, duration))
+    Args:
+        cumulative: 每个级数的累积转移分布
+        count: 采样步数
+        state: 起始级数下标（不包含在结果中）
+        rng: 随机数源（random 模块或 random.Random 实例）
 
-        return chords
+    Returns:
+        依次到达的级数下标列表 0-6
+    """
+    rand = rng.random
+    bisect_right = bisect.bisect_right
+    bisect_left = bisect.bisect_left
+    degrees = []
+    for _ in range(count):
+        row = cumulative[state]
+        state = bisect_right(row, rand())
+        if state == len(row):
+            # 浮点累加可能使最后一项略小于 1，越界时落在最后一个非零权重上
+            state = bisect_left(row, row[-1])
+        degrees.append(state)
+    return degrees
+
+class MarkovProgressionStrategy(HarmonyStrategy):
+    """基于级数马尔可夫链的和弦进行策略，可生成任意长度且不机械重复的进行"""
+
+    __slots__ = ("_cumulative", "start_index")
+
+    def __init__(
+        self,
+        key: Key,
+        beats_per_bar: int = 4,
+        transitions: Optional[Sequence[Sequence[float]]] = None,
+        start_degree: int = 1
+    ):
+        """
+        Args:
+            key: 调
+            beats_per_bar: 每小节拍数
+            transitions: 7x7 转移权重（行为当前级数，列为下一级数），默认使用流行音乐统计
+            start_degree: 起始和弦级数 (1-7)
+        """
+        super().__init__(key, beats_per_bar)
+        self._cumulative = (_DEFAULT_MARKOV_CUMULATIVE if transitions is None
+                            else _cumulative_transitions(transitions))
+        self.start_index = start_degree - 1
+
+    def generate(
+        self,
+        num_bars: int,
+        chords_per_bar: int = 1,
+        end_on_tonic: bool = True,
+        **kwargs
+    ) -> List[Tuple[int, float]]:
+        """
+        按转移概率随机游走生成和弦序列
+
+        Args:
+            num_bars: 小节数量
+            chords_per_bar: 每小节和弦数量
+            end_on_tonic: 是否以主和弦结束
+
+        Returns:
+            [(根音MIDI, 时值), ...]
+        """
+        total_chords = num_bars * chords_per_bar
+        if total_chords <= 0:
+            return []
+
+        degrees = [self.start_index]
+        degrees += _sample_markov(self._cumulative, total_chords - 1, self.start_index, random)
+        if end_on_tonic and total_chords >= 2:
+            degrees[-1] = 0
+
+        roots = _diatonic_table(self.key)[1]
+        duration = self.beats_per_bar / chords_per_bar
+        return [(roots[degree], duration) for degree in degrees]
 
 
 class HybridHarmonyStrategy(HarmonyStrategy):
     """混合和声策略 - 组合多种策略"""
 
+    __slots__ = ("strategies",)
+
     def __init__(
         self,
         key: Key,
@@ -461,11 +696,11 @@ class HybridHarmonyStrategy(HarmonyStrategy):
         first_bars = int(num_bars * split_ratio)
         second_bars = num_bars - first_bars
 
-        # 使用不同策略生成不同部分
-        first_part = self.strategies[0].generate(first_bars, **kwargs)
-        second_part = self.strategies[1].generate(second_bars, **kwargs)
+        # 使用不同策略生成不同部分，依次写入同一个列表
+        result = self.strategies[0].generate(first_bars, **kwargs)
+        result.extend(self.strategies[1].generate(second_bars, **kwargs))
 
-        return first_part + second_part
+        return result
 
 
 # ==================== 和声生成器工厂类 ====================
@@ -473,10 +708,13 @@ class HybridHarmonyStrategy(HarmonyStrategy):
 class HarmonyGenerator:
     """和声生成器工厂类"""
 
+    __slots__ = ("strategy", "key", "_scale_notes", "_scale_index")
+
     STRATEGIES = {
         "progression": ProgressionBasedStrategy,
         "diatonic": DiatonicStrategy,
         "functional": FunctionalStrategy,
+        "markov": MarkovProgressionStrategy,
         "hybrid": HybridHarmonyStrategy
     }
 
@@ -506,6 +744,10 @@ class HarmonyGenerator:
         self.strategy = strategy_class(key, beats_per_bar, **strategy_params)
         self.key = key
 
+        # 两个八度的音阶及音符到级数的索引，供 generate_chord_objects 反查根音级数
+        self._scale_notes = get_scale_notes(key, num_octaves=2)
+        self._scale_index = {note: index for index, note in enumerate(self._scale_notes)}
+
     def generate(self, num_bars: int = 16, **kwargs) -> List[Tuple[int, float]]:
         """
         生成和弦序列
@@ -531,19 +773,22 @@ class HarmonyGenerator:
             Chord对象列表
         """
         root_duration_list = self.generate(num_bars, **kwargs)
-        scale_notes = get_scale_notes(self.key, num_octaves=2)
+        scale_notes = self._scale_notes
+        scale_index = self._scale_index
 
         chords = []
         for root_midi, duration in root_duration_list:
             # 找到对应的音级
-            try:
-                root_index = scale_notes.index(root_midi)
-            except ValueError:
-                # 如果不在音阶中，找最近的音阶音
-                root_index = min(
-                    range(len(scale_notes)),
-                    key=lambda i: abs(scale_notes[i] - root_midi)
-                )
+            root_index = scale_index.get(root_midi)
+            if root_index is None:
+                # 如果不在音阶中，二分查找最近的音阶音（距离相同时取较低的音）
+                pos = bisect.bisect_left(scale_notes, root_midi)
+                if pos == 0:
+                    root_index = 0
+                elif pos == len(scale_notes) or root_midi - scale_notes[pos - 1] <= scale_notes[pos] - root_midi:
+                    root_index = pos - 1
+                else:
+                    root_index = pos
 
             # 创建和弦对象（默认使用大三和弦）
             chord = Chord(root=root_index, quality=ChordQuality.MAJOR)
@@ -584,10 +829,52 @@ def create_harmony(
     Returns:
         [(根音MIDI, 时值), ...]
     """
-    generator = HarmonyGenerator(strategy_name, key, beats_per_bar, **params)
+    # 构造参数只取策略构造函数声明的部分，其余参数留给 generate；两者都不认识的参数直接报错
+    strategy_class = HarmonyGenerator.STRATEGIES.get(strategy_name, ProgressionBasedStrategy)
+    init_names = _declared_param_names(strategy_class.__init__)
+    generate_names = _declared_param_names(strategy_class.generate)
+    if strategy_class is HybridHarmonyStrategy:
+        # 混合策略把 generate 参数原样转交给子策略
+        generate_names = generate_names.union(
+            *(_declared_param_names(cls.generate) for cls in HarmonyGenerator.STRATEGIES.values())
+        )
+    unknown = params.keys() - init_names - generate_names
+    if unknown:
+        raise TypeError(f"{strategy_class.__name__} 不支持的参数: {', '.join(sorted(unknown))}")
+    init_params = {name: value for name, value in params.items() if name in init_names}
+
+    # 构造过程不含随机性的策略复用缓存的生成器，否则每次新建（如随机挑选和弦进行）
+    deterministic = (
+        strategy_class in (DiatonicStrategy, FunctionalStrategy, MarkovProgressionStrategy)
+        or (strategy_class is ProgressionBasedStrategy and init_params.get("progression_name"))
+    )
+    if deterministic:
+        try:
+            generator = _cached_generator(strategy_name, key, beats_per_bar,
+                                          tuple(sorted(init_params.items())))
+        except TypeError:
+            # 参数不可哈希时无法缓存
+            generator = HarmonyGenerator(strategy_name, key, beats_per_bar, **init_params)
+    else:
+        generator = HarmonyGenerator(strategy_name, key, beats_per_bar, **init_params)
+
     return generator.generate(num_bars, **params)
 
 
+@lru_cache(maxsize=None)
+def _declared_param_names(func: Callable) -> frozenset:
+    """函数显式声明的关键字参数名（不含 **kwargs），按函数缓存"""
+    return frozenset(param.name for param in inspect.signature(func).parameters.values()
+                     if param.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY))
+
+
+@lru_cache(maxsize=64)
+def _cached_generator(strategy_name: str, key: Optional[Key], beats_per_bar: int,
+                      params_key: Tuple[Tuple[str, object], ...]) -> HarmonyGenerator:
+    """按策略名、调、拍数和构造参数缓存的和声生成器"""
+    return HarmonyGenerator(strategy_name, key, beats_per_bar, **dict(params_key))
+
+
 def create_progression_harmony(
     progression_name: str,
     key: Optional[Key] = None,
@@ -660,6 +947,10 @@ class HarmonyGenerator_Legacy:
             raise ValueError(f"Progression '{progression_name}' not found. "
                            f"Available: {list(CHORD_PROGRESSIONS.keys())}")
 
+        # 和弦进行固定不变，和弦对象只构建一次
+        self._chord_objs = tuple(Chord(root=degree, quality=quality)
+                                 for degree, quality in self.progression.chords)
+
     def generate(self, key: Key, chords_per_bar: int = 1):
         """
         生成和弦序列（返回Chord对象列表，兼容旧代码）
@@ -671,14 +962,7 @@ class HarmonyGenerator_Legacy:
         Returns:
             Chord对象列表
         """
-        chords = []
-        for degree, quality in self.progression.chords:
-            chord = Chord(root=degree, quality=quality)
-            chords.extend([chord] * chords_per_bar)
-        return chords
-
+        return [chord for chord in self._chord_objs for _ in range(chords_per_bar)]
 
-# 使用新的生成器作为默认实现
-HarmonyGenerator = HarmonyGenerator
 
 # 注意：__all__ 现在由包的 __init__.py 文件统一管理
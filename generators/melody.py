@@ -10,7 +10,11 @@ MIDI Music Generator - Melody Generation Module
 """
 
 from abc import ABC, abstractmethod
+from array import array
 from typing import List, Tuple, Dict, Optional, Callable
+import bisect
+import heapq
+import itertools
 import random
 import math
 from core.theory import (
@@ -26,6 +30,8 @@ class MelodyStrategy(ABC):
         self.key = key
         self.length = length
         self.scale_notes = get_scale_notes(key, num_octaves=2)
+        # 音阶音 -> 下标，用于 O(1) 的成员判断和位置查找
+        self._scale_index = {note: index for index, note in enumerate(self.scale_notes)}
 
     @abstractmethod
     def generate(self, key: Key, length: int, **kwargs) -> List[int]:
@@ -33,26 +39,23 @@ class MelodyStrategy(ABC):
 
     def apply_velocity_curve(self, notes: List[int], curve_type: str = "flat") -> List[int]:
         """应用力度曲线：flat, arch, rising, falling, random"""
-        velocities = []
-
-        if curve_type == "flat":
-            velocities = [80] * len(notes)
-        elif curve_type == "arch":
-            mid_point = len(notes) // 2
-            for i, note in enumerate(notes):
-                normalized_pos = abs(i - mid_point) / max(mid_point, 1)
-                velocity = int(127 * (1 - normalized_pos * 0.6))
-                velocities.append(max(50, min(127, velocity)))
-        elif curve_type == "rising":
-            velocities = [int(64 + (i / len(notes)) * 63) for i in range(len(notes))]
-        elif curve_type == "falling":
-            velocities = [int(127 - (i / len(notes)) * 63) for i in range(len(notes))]
-        elif curve_type == "random":
-            velocities = [random.randint(60, 120) for _ in notes]
-        else:
-            velocities = [80] * len(notes)
-
-        return velocities
+        # 每种曲线由一个表达式一次生成整列力度
+        count = len(notes)
+
+        if curve_type == "arch":
+            mid_point = count // 2
+            span = max(mid_point, 1)
+            return [max(50, min(127, int(127 * (1 - abs(i - mid_point) / span * 0.6))))
+                    for i in range(count)]
+        if curve_type == "rising":
+            return [int(64 + (i / count) * 63) for i in range(count)]
+        if curve_type == "falling":
+            return [int(127 - (i / count) * 63) for i in range(count)]
+        if curve_type == "random":
+            randint = random.randint
+            return [randint(60, 120) for _ in range(count)]
+        # flat 及未知类型
+        return [80] * count
 
     def add_timing_variations(self, notes: List[int], base_duration: float = 0.5) -> List[Tuple[int, float]]:
         """添加时值变化"""
@@ -69,6 +72,7 @@ class RandomWalkStrategy(MelodyStrategy):
     def __init__(self, key: Key, transition_matrix: Optional[Dict] = None):
         super().__init__(key)
         self.transition_matrix = transition_matrix or self._create_default_transition_matrix()
+        self._transition_tables = self._build_transition_tables(self.transition_matrix)
 
     def _create_default_transition_matrix(self) -> Dict[int, Dict[int, float]]:
         """创建默认的马尔可夫转移矩阵"""
@@ -84,7 +88,7 @@ class RandomWalkStrategy(MelodyStrategy):
             transitions = {}
             for interval, weight in interval_weights.items():
                 target_note = note + interval
-                if target_note in self.scale_notes:
+                if target_note in self._scale_index:
                     transitions[target_note] = weight
             total = sum(transitions.values())
             if total > 0:
@@ -92,29 +96,57 @@ class RandomWalkStrategy(MelodyStrategy):
             matrix[note] = transitions
         return matrix
 
+    @staticmethod
+    def _build_transition_tables(matrix: Dict[int, Dict[int, float]]
+                                 ) -> Dict[int, Tuple[Tuple[int, ...], Tuple[float, ...], Tuple[int, ...]]]:
+        """
+        把转移矩阵预处理为采样表：当前音 -> (目标音, 累积概率, 半音邻近的音阶外音符)
+
+        累积概率与 random.choices 内部的累加方式相同，按表二分查找的采样结果与其一致
+        """
+        tables = {}
+        for note, transitions in matrix.items():
+            targets = tuple(transitions.keys())
+            cum_weights = tuple(itertools.accumulate(transitions.values()))
+            chromatic_options = tuple(n for n in range(note - 3, note + 4)
+                                      if n not in transitions and 48 <= n <= 84)
+            tables[note] = (targets, cum_weights, chromatic_options)
+        return tables
+
     def generate(self, key: Key, length: int, **kwargs) -> List[int]:
         melody = []
         current_note = kwargs.get('start_note', self.scale_notes[0])
+        tables = self._transition_tables
+        rand = random.random
+        bisect_right = bisect.bisect_right
 
         for _ in range(length):
             melody.append(current_note)
-            if current_note in self.transition_matrix:
-                transitions = self.transition_matrix[current_note]
-                notes = list(transitions.keys())
-                probabilities = list(transitions.values())
-                if random.random() < 0.1:  # 10%概率选择音阶外音符
-                    chromatic_options = [n for n in range(current_note - 3, current_note + 4)
-                                        if n not in notes and 48 <= n <= 84]
+            table = tables.get(current_note)
+            if table is not None:
+                targets, cum_weights, chromatic_options = table
+                if rand() < 0.1:  # 10%概率选择音阶外音符
                     if chromatic_options:
                         current_note = random.choice(chromatic_options)
                 else:
-                    current_note = random.choices(notes, probabilities)[0]
+                    total = cum_weights[-1]
+                    current_note = targets[bisect_right(cum_weights, rand() * total, 0, len(cum_weights) - 1)]
             else:
-                index = self.scale_notes.index(current_note) if current_note in self.scale_notes else 0
+                index = self._scale_index.get(current_note, 0)
                 next_index = max(0, min(len(self.scale_notes) - 1, index + random.choice([-2, -1, 0, 1, 2])))
                 current_note = self.scale_notes[next_index]
         return melody
 
+def _transpose_up_two(motif: array) -> array:
+    """整体上移 2 个半音"""
+    return array('h', map((2).__add__, motif))
+
+def _transpose_even_positions_up_two(motif: array) -> array:
+    """偶数位置的音上移 2 个半音，奇数位置保持不变"""
+    varied = array('h', motif)
+    varied[::2] = _transpose_up_two(motif[::2])
+    return varied
+
 class PatternBasedStrategy(MelodyStrategy):
     """基于乐句模式的策略"""
 
@@ -126,59 +158,68 @@ class PatternBasedStrategy(MelodyStrategy):
         variation_type = kwargs.get('variation_type', 'interval')
 
         builder = PhraseBuilder(length)
-        motif = random.sample(self.scale_notes, motif_size)
+        # 动机以 int16 数组保存，与 PhraseBuilder 的缓冲区类型一致，变奏直接在数组上完成
+        motif = array('h', random.sample(self.scale_notes, motif_size))
         builder.add_motif(motif, repeat=repeat_count)
 
         if variation_type == 'interval':
-            builder.add_variation(motif, lambda m: [note + 2 for note in m])
+            builder.add_variation(motif, _transpose_up_two)
         elif variation_type == 'rhythm':
-            builder.add_variation(motif, lambda m: [m[i % len(m)] for i in range(len(m)*2)])
+            builder.add_variation(motif, lambda m: m * 2)
         else:
-            builder.add_variation(motif, lambda m: [note + 2 if i % 2 == 0 else note
-                                                  for i, note in enumerate(m)])
+            builder.add_variation(motif, _transpose_even_positions_up_two)
         builder.add_cadence(key)
         return builder.build()
 
+# 默认风格随机游走的步进音程（半音）
+_NEURAL_STEP_INTERVALS = (-2, -1, 1, 2, -3, 3, -4, 4, -5, 5)
+
 class NeuralStyleStrategy(MelodyStrategy):
     """神经网络风格策略（预留接口）"""
 
     def __init__(self, key: Key, model_path: Optional[str] = None):
         super().__init__(key)
         self.model_path = model_path
+        # 流行风格的候选邻音只取决于前一个音，按音阶音预先计算
+        self._pop_neighbors = {
+            note: tuple(n for n in self.scale_notes if abs(n - note) <= 4)
+            for note in self.scale_notes
+        }
         print("Warning: NeuralStyleStrategy is a placeholder. Install required ML libraries for full functionality.")
 
     def generate(self, key: Key, length: int, **kwargs) -> List[int]:
         style = kwargs.get('style', 'classical')
 
         if style == 'jazz':
+            # 7 个调内和弦的音符只计算一次，循环中按级数查表
+            diatonic_chord_notes = [get_diatonic_chord(degree, key).get_midi_notes(key)
+                                    for degree in range(1, 8)]
             melody = []
             for i in range(length):
                 if random.random() < 0.6:
-                    chord = get_diatonic_chord(random.randint(1, 7), key)
-                    chord_notes = chord.get_midi_notes(key)
+                    chord_notes = diatonic_chord_notes[random.randint(1, 7) - 1]
                     melody.append(random.choice(chord_notes))
                 else:
                     melody.append(random.choice(self.scale_notes))
         elif style == 'pop':
-            melody = [self.scale_notes[0]]
+            choice = random.choice
+            pop_neighbors = self._pop_neighbors
+            prev_note = self.scale_notes[0]
+            melody = [prev_note]
             for i in range(1, length):
-                prev_note = melody[-1]
-                neighbors = [n for n in self.scale_notes if abs(n - prev_note) <= 4]
-                if neighbors:
-                    melody.append(random.choice(neighbors))
-                else:
-                    melody.append(random.choice(self.scale_notes))
+                neighbors = pop_neighbors.get(prev_note)
+                prev_note = choice(neighbors) if neighbors else choice(self.scale_notes)
+                melody.append(prev_note)
         else:
+            choice = random.choice
+            scale_notes = self.scale_notes
+            scale_index = self._scale_index
             melody = []
-            current_note = self.scale_notes[0]
+            current_note = scale_notes[0]
             for _ in range(length):
                 melody.append(current_note)
-                interval = random.choice([-2, -1, 1, 2, -3, 3, -4, 4, -5, 5])
-                next_note = current_note + interval
-                if next_note in self.scale_notes:
-                    current_note = next_note
-                else:
-                    current_note = random.choice(self.scale_notes)
+                next_note = current_note + choice(_NEURAL_STEP_INTERVALS)
+                current_note = next_note if next_note in scale_index else choice(scale_notes)
         return melody
 
 class GeneticOptimizationStrategy(MelodyStrategy):
@@ -190,42 +231,96 @@ class GeneticOptimizationStrategy(MelodyStrategy):
         self.generations = generations
         self.mutation_rate = 0.1
         self.crossover_rate = 0.7
-
-    def _fitness_function(self, melody: List[int], chords: List[Chord]) -> float:
-        """适应度函数：评估旋律与和弦的协和程度"""
-        total_score = 0.0
-        for i, note in enumerate(melody):
-            chord_index = min(i // (len(melody) // len(chords)), len(chords) - 1)
-            chord = chords[chord_index]
-            chord_notes = set(chord.get_midi_notes(self.key))
-            scale_notes = set(self.scale_notes)
-
-            if note % 12 in {cn % 12 for cn in chord_notes}:
-                total_score += 1.0
-            elif note % 12 in {sn % 12 for sn in scale_notes}:
-                total_score += 0.5
+        # 音阶音级在构造时确定，适应度计算时直接查表
+        self._scale_pitch_classes = frozenset(note % 12 for note in self.scale_notes)
+
+    def _fitness_segments(self, chords: List[Chord], length: int) -> List[Tuple[int, int, bytes]]:
+        """
+        预计算适应度评分表：旋律按和弦切分为若干段，每段一张 256 项的评分表
+
+        评分表把音高映射为两倍分值：和弦音 2，音阶音 1，其他 0，
+        这样整段评分可以用 bytes.translate 一次完成
+        """
+        notes_per_chord = length // len(chords)
+        last_chord = len(chords) - 1
+        scale_pitch_classes = self._scale_pitch_classes
+        segments = []
+        for chord_index, chord in enumerate(chords):
+            start = chord_index * notes_per_chord
+            end = length if chord_index == last_chord else start + notes_per_chord
+            chord_pitch_classes = {note % 12 for note in chord.get_midi_notes(self.key)}
+            table = bytes(2 if note % 12 in chord_pitch_classes else
+                          1 if note % 12 in scale_pitch_classes else 0
+                          for note in range(256))
+            segments.append((start, end, table))
+        return segments
+
+    def _population_fitness(self, population: List[bytes], segments: List[Tuple[int, int, bytes]],
+                            cache: Dict[bytes, float]) -> List[float]:
+        """适应度函数：批量评估整个种群的旋律与和弦的协和程度，相同个体只计算一次"""
+        scores = []
+        for individual in population:
+            score = cache.get(individual)
+            if score is None:
+                doubled = 0
+                for start, end, table in segments:
+                    doubled += sum(individual[start:end].translate(table))
+                score = cache[individual] = doubled / 2 / len(individual)
+            scores.append(score)
+
+        # 缓存按插入顺序淘汰最旧的条目，最多保留种群规模的 4 倍
+        excess = len(cache) - 4 * self.population_size
+        if excess > 0:
+            for individual in list(itertools.islice(cache, excess)):
+                del cache[individual]
+        return scores
+
+    def _reproduce(self, parents: List[bytes], count: int) -> List[bytes]:
+        """
+        一次生成 count 个子代：随机配对父代，按交叉率单点交叉，再逐音变异
+
+        子代成对生成，count 为奇数时多出的一个照常生成后丢弃，随机数的消耗顺序保持不变
+        """
+        rand = random.random
+        randint = random.randint
+        choice = random.choice
+        sample = random.sample
+        scale_notes = self.scale_notes
+        mutation_rate = self.mutation_rate
+        crossover_rate = self.crossover_rate
+        length = len(parents[0])
+        positions = range(length)
+
+        children = []
+        while len(children) < count:
+            parent1, parent2 = sample(parents, 2)
+            if rand() < crossover_rate:
+                point = randint(1, length - 1)
+                pair = (parent1[:point] + parent2[point:], parent2[:point] + parent1[point:])
             else:
-                total_score += 0.0
-        return total_score / len(melody)
-
-    def _crossover(self, parent1: List[int], parent2: List[int]) -> Tuple[List[int], List[int]]:
-        """交叉操作"""
-        crossover_point = random.randint(1, len(parent1) - 1)
-        child1 = parent1[:crossover_point] + parent2[crossover_point:]
-        child2 = parent2[:crossover_point] + parent1[crossover_point:]
-        return child1, child2
-
-    def _mutate(self, melody: List[int]) -> List[int]:
-        """变异操作"""
-        mutated = melody.copy()
-        for i in range(len(mutated)):
-            if random.random() < self.mutation_rate:
-                mutated[i] = random.choice(self.scale_notes)
-        return mutated
-
-    def _initialize_population(self, length: int) -> List[List[int]]:
-        """初始化种群"""
-        return [[random.choice(self.scale_notes) for _ in range(length)]
+                pair = (parent1, parent2)
+
+            for child in pair:
+                # 只有真正发生变异时才复制出可写的 bytearray
+                mutated = None
+                for i in positions:
+                    if rand() < mutation_rate:
+                        if mutated is None:
+                            mutated = bytearray(child)
+                        mutated[i] = choice(scale_notes)
+                children.append(child if mutated is None else bytes(mutated))
+
+        del children[count:]
+        return children
+
+    def _initialize_population(self, length: int) -> List[bytes]:
+        """
+        初始化种群
+
+        每个个体是一段 bytes（每个音符一个字节，MIDI 音高不超过 127），
+        切片拼接和复制都在 C 层完成，且不可变的个体可以在种群间直接共享
+        """
+        return [bytes([random.choice(self.scale_notes) for _ in range(length)])
                 for _ in range(self.population_size)]
 
     def generate(self, key: Key, length: int, **kwargs) -> List[int]:
@@ -240,31 +335,122 @@ class GeneticOptimizationStrategy(MelodyStrategy):
                 chords = [TheoryChord(root=degree-1, quality=quality)
                          for degree, quality in progression.chords]
 
+        # 评分表只计算一次，各岛屿共用
+        segments = self._fitness_segments(chords, length)
+
+        n_islands = kwargs.get('n_islands', 1)
+        if n_islands <= 1:
+            return list(self._evolve(length, segments)[1])
+
+        # 多岛模式：各岛屿是互不通信的独立种群，依次以各自的种子进化，取适应度最高者
+        # 每个岛屿的随机种子由当前随机状态派生，整体结果仍可由 random.seed 复现；
+        # 进化结束后恢复派生种子之后的随机状态，调用方后续的随机序列不受岛屿进化影响
+        seeds = [random.getrandbits(64) for _ in range(n_islands)]
+        state = random.getstate()
+        results = []
+        try:
+            for seed in seeds:
+                random.seed(seed)
+                results.append(self._evolve(length, segments))
+        finally:
+            random.setstate(state)
+        _, best_individual = max(results, key=lambda result: result[0])
+        return list(best_individual)
+
+    def _evolve(self, length: int, segments: List[Tuple[int, int, bytes]]) -> Tuple[float, bytes]:
+        """在当前进程中进化一个种群，返回 (最佳适应度, 最佳个体)"""
+        # 保留到下一代的个体不重复评分
+        fitness_cache = {}
+
         population = self._initialize_population(length)
 
         for generation in range(self.generations):
-            fitness_scores = [self._fitness_function(individual, chords)
-                            for individual in population]
-            sorted_indices = sorted(range(len(fitness_scores)),
-                                   key=lambda i: fitness_scores[i], reverse=True)
-            selected = [population[i] for i in sorted_indices[:self.population_size // 2]]
-            new_population = selected.copy()
-
-            while len(new_population) < self.population_size:
-                parent1, parent2 = random.sample(selected, 2)
-                if random.random() < self.crossover_rate:
-                    child1, child2 = self._crossover(parent1, parent2)
-                else:
-                    child1, child2 = parent1.copy(), parent2.copy()
-                child1 = self._mutate(child1)
-                child2 = self._mutate(child2)
-                new_population.extend([child1, child2])
-            population = new_population[:self.population_size]
+            fitness_scores = self._population_fitness(population, segments, fitness_cache)
+            # 只需要前一半个体，部分选择即可（与完整降序排序后截取的结果和顺序一致）
+            top_indices = heapq.nlargest(self.population_size // 2, range(len(fitness_scores)),
+                                         key=fitness_scores.__getitem__)
+            selected = [population[i] for i in top_indices]
+            selected.extend(self._reproduce(selected, self.population_size - len(selected)))
+            population = selected
+
+        fitness_scores = self._population_fitness(population, segments, fitness_cache)
+        best_index = max(range(len(fitness_scores)), key=fitness_scores.__getitem__)
+        return fitness_scores[best_index], population[best_index]
+
+def _mcts_state_score(new_length: int, target_length: int, low: Optional[int], high: Optional[int],
+                      last_note: Optional[int], intervals: set, next_note: int) -> float:
+    """
+    增量评估：在已有旋律（音域 low-high，末音 last_note，音程集合 intervals）后接 next_note
+    得到的状态价值，结果与 MonteCarloTreeSearchStrategy._evaluate_state 对完整旋律的评估相同
+    """
+    if new_length < target_length:
+        return 0.0
+
+    completion = new_length / target_length
+    if last_note is not None:
+        interval_count = len(intervals) + (abs(next_note - last_note) not in intervals)
+        interval_diversity = interval_count / (new_length - 1)
+        pitch_range = (max(high, next_note) - min(low, next_note)) / 12
+    else:
+        interval_diversity = 0.0
+        pitch_range = 0.0
+
+    range_score = min(1.0, pitch_range / 2.0)
+    return (completion * 0.4 + interval_diversity * 0.4 + range_score * 0.2)
+
+def _mcts_rollout(first_notes: Tuple[int, ...], next_notes: Dict[int, Tuple[int, ...]],
+                  length: int, rng) -> Tuple[List[int], float]:
+    """
+    MCTS 单次模拟核心，只处理整数音高
+
+    Args:
+        first_notes: 第一个音的候选
+        next_notes: 上一个音 -> 下一个音的候选
+        length: 旋律长度
+        rng: 随机数源（random 模块或 random.Random 实例）
+
+    Returns:
+        (旋律, 旋律的状态价值)
+    """
+    rand = rng.random
+    choice = rng.choice
+    melody = []
+    # 随旋律增长增量维护音域和音程集合，候选音的评估为 O(1)
+    low = high = last_note = None
+    intervals = set()
+    final_score = 0.0
+
+    for position in range(length):
+        possible_notes = first_notes if last_note is None else next_notes[last_note]
+
+        if position < length - 1:
+            # 未完成的旋律价值恒为 0，取第一个候选
+            best_next_note = possible_notes[0]
+        else:
+            best_next_note = None
+            best_next_score = -1
+            for next_note in possible_notes:
+                score = _mcts_state_score(length, length, low, high, last_note, intervals, next_note)
+                if score > best_next_score:
+                    best_next_score = score
+                    best_next_note = next_note
+
+        if rand() < 0.2:  # 20%概率随机选择
+            best_next_note = choice(possible_notes)
+
+        if position == length - 1:
+            final_score = _mcts_state_score(length, length, low, high, last_note, intervals, best_next_note)
+
+        melody.append(best_next_note)
+        if last_note is None:
+            low = high = best_next_note
+        else:
+            intervals.add(abs(best_next_note - last_note))
+            low = min(low, best_next_note)
+            high = max(high, best_next_note)
+        last_note = best_next_note
 
-        fitness_scores = [self._fitness_function(individual, chords)
-                         for individual in population]
-        best_index = fitness_scores.index(max(fitness_scores))
-        return population[best_index]
+    return melody, final_score
 
 class MonteCarloTreeSearchStrategy(MelodyStrategy):
     """蒙特卡洛树搜索策略"""
@@ -273,6 +459,13 @@ class MonteCarloTreeSearchStrategy(MelodyStrategy):
         super().__init__(key)
         self.simulations = simulations
         self.exploration_weight = 1.4
+        # 候选下一音只取决于上一个音，按上一个音预先计算（旋律中的音都来自音阶）
+        self._first_notes = (self.scale_notes[0],)
+        self._next_cache = {
+            last_note: tuple(note for note in self.scale_notes
+                             if 48 <= note <= 84 and abs(note - last_note) <= 8) or (last_note,)
+            for last_note in self.scale_notes
+        }
 
     def _evaluate_state(self, notes: List[int], target_length: int) -> float:
         """评估当前状态的价值"""
@@ -290,39 +483,26 @@ class MonteCarloTreeSearchStrategy(MelodyStrategy):
         range_score = min(1.0, pitch_range / 2.0)
         return (completion * 0.4 + interval_diversity * 0.4 + range_score * 0.2)
 
-    def _get_possible_next_notes(self, current_notes: List[int]) -> List[int]:
+    def _get_possible_next_notes(self, current_notes: List[int]) -> Tuple[int, ...]:
         """获取可能的下一个音符"""
         if not current_notes:
-            return [self.scale_notes[0]]
+            return self._first_notes
 
         last_note = current_notes[-1]
-        possible_notes = [note for note in self.scale_notes
-                          if 48 <= note <= 84 and abs(note - last_note) <= 8]
-        return possible_notes if possible_notes else [last_note]
+        possible_notes = self._next_cache.get(last_note)
+        if possible_notes is None:
+            possible_notes = tuple(note for note in self.scale_notes
+                                   if 48 <= note <= 84 and abs(note - last_note) <= 8) or (last_note,)
+        return possible_notes
 
     def generate(self, key: Key, length: int, **kwargs) -> List[int]:
         best_melody = []
         best_score = -1
+        first_notes = self._first_notes
+        next_cache = self._next_cache
 
         for simulation in range(self.simulations):
-            current_melody = []
-            for position in range(length):
-                possible_notes = self._get_possible_next_notes(current_melody)
-
-                best_next_note = None
-                best_next_score = -1
-                for next_note in possible_notes:
-                    test_melody = current_melody + [next_note]
-                    score = self._evaluate_state(test_melody, length)
-                    if score > best_next_score:
-                        best_next_score = score
-                        best_next_note = next_note
-
-                if random.random() < 0.2:  # 20%概率随机选择
-                    best_next_note = random.choice(possible_notes)
-                current_melody.append(best_next_note)
-
-            final_score = self._evaluate_state(current_melody, length)
+            current_melody, final_score = _mcts_rollout(first_notes, next_cache, length, random)
             if final_score > best_score:
                 best_score = final_score
                 best_melody = current_melody
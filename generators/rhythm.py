@@ -9,7 +9,11 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Tuple, Optional
+from array import array
+from typing import List, Dict, Tuple, Optional, Callable
+from functools import lru_cache
+import bisect
+import itertools
 import random
 from enum import Enum
 
@@ -112,20 +116,132 @@ RHYTHM_PATTERNS = {
     RhythmPattern.DUBSTEP: [1.0, 0.25, 0.75, 1.0, 0.5, 0.5, 0.25, 0.25, 0.5],
 }
 
+# 节奏型 -> (时值元组, 总拍数)，导入时计算一次，生成时不再逐次求和
+_RHYTHM_PATTERN_TABLE = {
+    pattern: (tuple(durations), sum(durations))
+    for pattern, durations in RHYTHM_PATTERNS.items()
+}
+_DEFAULT_PATTERN_ENTRY = ((1.0, 1.0, 1.0, 1.0), 4.0)
+
+# 未指定节奏型时的随机候选（按枚举定义顺序）
+_ALL_PATTERNS = tuple(RhythmPattern)
+
+# 风格名 -> 节奏型
+_STYLE_PATTERN_MAP = {
+    "rock": RhythmPattern.ROCK_BEAT,
+    "disco": RhythmPattern.DISCO,
+    "hiphop": RhythmPattern.HIP_HOP,
+    "house": RhythmPattern.HOUSE,
+    "techno": RhythmPattern.TECHNO,
+    "trance": RhythmPattern.TRANCE,
+    "jazz": RhythmPattern.SWING_EIGHTHS,
+    "bossa": RhythmPattern.BOSSA_NOVA,
+    "samba": RhythmPattern.SAMBA,
+    "salsa": RhythmPattern.SALSA,
+    "dubstep": RhythmPattern.DUBSTEP,
+}
+
+# 全部由同一时值构成的节奏型（稳定四分/八分、摇滚、House/Techno/Trance 十六分等）-> 该时值，
+# 生成时直接按总拍数计算音符个数，不再重复模式后截断
+_CONSTANT_PATTERN_DURATIONS = {
+    pattern: durations[0]
+    for pattern, durations in RHYTHM_PATTERNS.items()
+    if len(set(durations)) == 1
+}
+
+
+# ==================== 时值序列核心函数 ====================
+
+def _truncate_to_total(durations: List[float], total_beats: float) -> List[float]:
+    """
+    把时值序列截断到恰好 total_beats 拍：保留累计不超过总拍数的前缀，
+    第一个超出的音符改为剩余拍数（剩余为 0 时丢弃）
+    """
+    # 在累计拍数上二分查找第一个超出总拍数的音符
+    cumulative = list(itertools.accumulate(durations))
+    cut = bisect.bisect_right(cumulative, total_beats)
+    trimmed = durations[:cut]
+    if cut < len(durations):
+        # 调整最后一个音符使其精确填满
+        remaining = total_beats - (cumulative[cut - 1] if cut else 0.0)
+        if remaining > 0:
+            trimmed.append(remaining)
+    return trimmed
+
+
+def _normalize_durations(durations: List[float], total_beats: float) -> List[float]:
+    """将时值序列规范化到 total_beats 拍：不足则重复最后一个音符补充，过多则截断"""
+    current_total = sum(durations)
+
+    if current_total == 0:
+        return [1.0] * total_beats
+
+    if current_total < total_beats:
+        # 不足则补充最后一个音符
+        last_duration = durations[-1] if durations else 1.0
+        durations.extend([last_duration] * int((total_beats - current_total) / last_duration))
+    elif current_total > total_beats:
+        # 过多则截断
+        durations = _truncate_to_total(durations, total_beats)
+
+    return durations
+
+
+@lru_cache(maxsize=256)
+def _pattern_rhythm(pattern: RhythmPattern, num_bars: int, beats_per_bar: int) -> Tuple[float, ...]:
+    """节奏型重复并规范化到指定小节数的结果，按 (节奏型, 小节数, 每小节拍数) 缓存"""
+    total_beats = num_bars * beats_per_bar
+
+    constant = _CONSTANT_PATTERN_DURATIONS.get(pattern)
+    if constant is not None:
+        # 等时值节奏型：整数个音符填满总拍数，剩余不足一个音符的部分补为最后一个音符
+        count = int(total_beats / constant)
+        durations = [constant] * count
+        remaining = total_beats - count * constant
+        if remaining > 0:
+            durations.append(remaining)
+        return tuple(durations)
+
+    base_pattern, pattern_beats = _RHYTHM_PATTERN_TABLE.get(pattern, _DEFAULT_PATTERN_ENTRY)
+
+    # 重复模式以填充所需小节数，一次按重复次数生成整个列表
+    repetitions = int(total_beats / pattern_beats) + 1
+    durations = list(base_pattern * repetitions)
+
+    return tuple(_normalize_durations(durations, total_beats))
+
+
+def _draw_note_flags(count: int, rest_probability: float,
+                     rand: Callable[[], float] = random.random) -> List[bool]:
+    """为 count 个音符逐个抽签：True 为音符，False 为休止符（概率 rest_probability）"""
+    return [rand() >= rest_probability for _ in range(count)]
+
+
+def _accent_velocities(durations: List[float], beats_per_bar: int) -> List[int]:
+    """强拍重音力度：音符起点落在小节第一拍上为 110，其余为 75"""
+    if not durations:
+        return []
+    # 每个音符的起始拍位置 = 之前所有时值之和
+    onsets = itertools.accumulate(durations[:-1], initial=0)
+    return [110 if onset % beats_per_bar < 0.1 else 75 for onset in onsets]
+
 
 # ==================== 节奏生成策略 ====================
 
 class RhythmStrategy(ABC):
     """节奏生成策略抽象基类"""
 
-    def __init__(self, beats_per_bar: int = 4):
+    def __init__(self, beats_per_bar: int = 4, seed: Optional[int] = None):
         """
         初始化节奏生成策略
 
         Args:
             beats_per_bar: 每小节拍数，默认4拍
+            seed: 随机种子；指定时使用独立的随机数生成器，结果可复现，
+                  None 则沿用全局 random 模块（受 random.seed 控制）
         """
         self.beats_per_bar = beats_per_bar
+        self._rng = random.Random(seed) if seed is not None else random
 
     @abstractmethod
     def generate(self, num_bars: int, **kwargs) -> List[float]:
@@ -143,66 +259,55 @@ class RhythmStrategy(ABC):
 
     def _normalize_to_bars(self, durations: List[float], num_bars: int) -> List[float]:
         """将节奏规范化到指定小节数"""
-        total_beats = num_bars * self.beats_per_bar
-        current_total = sum(durations)
-
-        if current_total == 0:
-            return [1.0] * total_beats
-
-        if current_total < total_beats:
-            # 不足则补充最后一个音符
-            last_duration = durations[-1] if durations else 1.0
-            durations.extend([last_duration] * int((total_beats - current_total) / last_duration))
-        elif current_total > total_beats:
-            # 过多则截断
-            trimmed = []
-            current = 0.0
-            for dur in durations:
-                if current + dur <= total_beats:
-                    trimmed.append(dur)
-                    current += dur
-                else:
-                    # 调整最后一个音符使其精确填满
-                    remaining = total_beats - current
-                    if remaining > 0:
-                        trimmed.append(remaining)
-                    break
-            durations = trimmed
-
-        return durations
+        return _normalize_durations(durations, num_bars * self.beats_per_bar)
 
 
 class RandomRhythmStrategy(RhythmStrategy):
     """随机节奏生成策略"""
 
-    def __init__(self, beats_per_bar: int = 4, allowed_durations: Optional[List[float]] = None):
+    def __init__(self, beats_per_bar: int = 4, allowed_durations: Optional[List[float]] = None,
+                 seed: Optional[int] = None):
         """
         初始化随机节奏策略
 
         Args:
             beats_per_bar: 每小节拍数
             allowed_durations: 允许的时值列表，单位拍
+            seed: 随机种子
         """
-        super().__init__(beats_per_bar)
+        super().__init__(beats_per_bar, seed)
         # 默认允许的时值：八分、四分、附点四分、二分
         self.allowed_durations = allowed_durations or [0.5, 1.0, 1.5, 2.0]
 
+        # 剩余拍数不足时的候选时值按上限预先分组：
+        # _options_by_rank[k] 为不超过第 k 小时值的全部允许时值（保持原顺序），
+        # 用 bisect 按剩余拍数定位 k，不再逐次过滤
+        self._sorted_durations = tuple(sorted(set(self.allowed_durations)))
+        self._options_by_rank = ((),) + tuple(
+            tuple(d for d in self.allowed_durations if d <= limit)
+            for limit in self._sorted_durations
+        )
+
     def generate(self, num_bars: int, **kwargs) -> List[float]:
         """生成随机节奏"""
         total_beats = num_bars * self.beats_per_bar
         durations = []
         current = 0.0
+        allowed_durations = self.allowed_durations
+        sorted_durations = self._sorted_durations
+        options_by_rank = self._options_by_rank
+        choice = self._rng.choice
 
         while current < total_beats:
             # 随机选择时值
-            duration = random.choice(self.allowed_durations)
+            duration = choice(allowed_durations)
 
             # 确保不超过剩余拍数
             remaining = total_beats - current
             if duration > remaining:
                 # 如果剩余空间不足，选择较小的时值或精确填充
-                smaller_options = [d for d in self.allowed_durations if d <= remaining]
-                duration = random.choice(smaller_options) if smaller_options else remaining
+                smaller_options = options_by_rank[bisect.bisect_right(sorted_durations, remaining)]
+                duration = choice(smaller_options) if smaller_options else remaining
 
             durations.append(duration)
             current += duration
@@ -213,117 +318,102 @@ class RandomRhythmStrategy(RhythmStrategy):
 class PatternBasedRhythmStrategy(RhythmStrategy):
     """基于预定义模式的节奏生成策略"""
 
-    def __init__(self, beats_per_bar: int = 4, pattern: Optional[RhythmPattern] = None):
+    def __init__(self, beats_per_bar: int = 4, pattern: Optional[RhythmPattern] = None,
+                 seed: Optional[int] = None):
         """
         初始化基于模式的节奏策略
 
         Args:
             beats_per_bar: 每小节拍数
             pattern: 节奏型，None则随机选择
+            seed: 随机种子
         """
-        super().__init__(beats_per_bar)
+        super().__init__(beats_per_bar, seed)
         self.pattern = pattern
 
     def generate(self, num_bars: int, **kwargs) -> List[float]:
         """基于模式生成节奏"""
         if self.pattern is None:
             # 随机选择一个模式
-            self.pattern = random.choice(list(RhythmPattern))
+            self.pattern = self._rng.choice(_ALL_PATTERNS)
 
-        base_pattern = RHYTHM_PATTERNS.get(self.pattern, [1.0, 1.0, 1.0, 1.0])
-        durations = []
-
-        # 重复模式以填充所需小节数
-        total_beats = num_bars * self.beats_per_bar
-        pattern_beats = sum(base_pattern)
-        repetitions = int(num_bars * self.beats_per_bar / pattern_beats) + 1
-
-        for _ in range(repetitions):
-            durations.extend(base_pattern)
-
-        return self._normalize_to_bars(durations, num_bars)
+        # 节奏型确定后结果只取决于小节数和拍号，重复调用直接复用缓存
+        return list(_pattern_rhythm(self.pattern, num_bars, self.beats_per_bar))
 
 
 class SwingRhythmStrategy(RhythmStrategy):
     """摇摆节奏策略"""
 
-    def __init__(self, beats_per_bar: int = 4, swing_ratio: float = 0.66):
+    def __init__(self, beats_per_bar: int = 4, swing_ratio: float = 0.66,
+                 seed: Optional[int] = None):
         """
         初始化摇摆节奏策略
 
         Args:
             beats_per_bar: 每小节拍数
             swing_ratio: 摇摆比例 (0.5-1.0)，0.66为标准三连音感觉
+            seed: 随机种子
         """
-        super().__init__(beats_per_bar)
+        super().__init__(beats_per_bar, seed)
         self.swing_ratio = swing_ratio
 
     def generate(self, num_bars: int, **kwargs) -> List[float]:
         """生成摇摆节奏"""
         total_beats = num_bars * self.beats_per_bar
-        durations = []
 
-        for _ in range(total_beats):
-            # 将每拍分为两个不等的部分
-            first_part = self.swing_ratio  # 第一拍较长
-            second_part = 1.0 - self.swing_ratio  # 第二拍较短
-            durations.extend([first_part, second_part])
-
-        return durations
+        # 将每拍分为两个不等的部分：第一拍较长，第二拍较短；整段由这一对时值重复得到
+        first_part = self.swing_ratio
+        second_part = 1.0 - self.swing_ratio
+        return [first_part, second_part] * total_beats
 
 
 class GrooveRhythmStrategy(RhythmStrategy):
     """风格化节奏策略"""
 
-    def __init__(self, beats_per_bar: int = 4, style: str = "rock"):
+    def __init__(self, beats_per_bar: int = 4, style: str = "rock", seed: Optional[int] = None):
         """
         初始化风格化节奏策略
 
         Args:
             beats_per_bar: 每小节拍数
             style: 音乐风格
+            seed: 随机种子
         """
-        super().__init__(beats_per_bar)
+        super().__init__(beats_per_bar, seed)
         self.style = style.lower()
+        # 风格对应的节奏型在初始化时确定一次
+        self.pattern = _STYLE_PATTERN_MAP.get(self.style, RhythmPattern.STEADY_QUARTERS)
 
     def generate(self, num_bars: int, **kwargs) -> List[float]:
         """根据风格生成节奏"""
-        style_patterns = {
-            "rock": RhythmPattern.ROCK_BEAT,
-            "disco": RhythmPattern.DISCO,
-            "hiphop": RhythmPattern.HIP_HOP,
-            "house": RhythmPattern.HOUSE,
-            "techno": RhythmPattern.TECHNO,
-            "trance": RhythmPattern.TRANCE,
-            "jazz": RhythmPattern.SWING_EIGHTHS,
-            "bossa": RhythmPattern.BOSSA_NOVA,
-            "samba": RhythmPattern.SAMBA,
-            "salsa": RhythmPattern.SALSA,
-            "dubstep": RhythmPattern.DUBSTEP,
-        }
-
-        pattern = style_patterns.get(self.style, RhythmPattern.STEADY_QUARTERS)
-        strategy = PatternBasedRhythmStrategy(self.beats_per_bar, pattern)
-        return strategy.generate(num_bars, **kwargs)
+        # 直接查询节奏型缓存，不再每次构造一个 PatternBasedRhythmStrategy 再委托
+        return list(_pattern_rhythm(self.pattern, num_bars, self.beats_per_bar))
 
 
 class HybridRhythmStrategy(RhythmStrategy):
     """混合节奏策略 - 结合多种策略"""
 
-    def __init__(self, beats_per_bar: int = 4, strategies: Optional[List[RhythmStrategy]] = None):
+    def __init__(self, beats_per_bar: int = 4, strategies: Optional[List[RhythmStrategy]] = None,
+                 seed: Optional[int] = None):
         """
         初始化混合节奏策略
 
         Args:
             beats_per_bar: 每小节拍数
             strategies: 策略列表，None则使用默认组合
+            seed: 随机种子，作用于本策略及默认组合中的子策略
         """
-        super().__init__(beats_per_bar)
+        super().__init__(beats_per_bar, seed)
         if strategies is None:
+            # 子策略的种子由本策略的随机数生成器派生，各自独立，不共享同一随机序列
+            if seed is not None:
+                pattern_seed, random_seed = self._rng.getrandbits(32), self._rng.getrandbits(32)
+            else:
+                pattern_seed = random_seed = None
             # 默认组合：模式节奏 + 随机变化
             self.strategies = [
-                PatternBasedRhythmStrategy(beats_per_bar, RhythmPattern.STEADY_QUARTERS),
-                RandomRhythmStrategy(beats_per_bar)
+                PatternBasedRhythmStrategy(beats_per_bar, RhythmPattern.STEADY_QUARTERS, seed=pattern_seed),
+                RandomRhythmStrategy(beats_per_bar, seed=random_seed)
             ]
         else:
             self.strategies = strategies
@@ -334,16 +424,15 @@ class HybridRhythmStrategy(RhythmStrategy):
         first_half_bars = num_bars // 2
         second_half_bars = num_bars - first_half_bars
 
-        # 第一部分使用第一个策略
-        first_rhythm = self.strategies[0].generate(first_half_bars, **kwargs)
-
-        # 第二部分使用第二个策略（如果存在）
-        if len(self.strategies) > 1:
-            second_rhythm = self.strategies[1].generate(second_half_bars, **kwargs)
-        else:
-            second_rhythm = self.strategies[0].generate(second_half_bars, **kwargs)
+        # 第一部分使用第一个策略，第二部分使用第二个策略（如果存在）
+        first_strategy = self.strategies[0]
+        second_strategy = self.strategies[1] if len(self.strategies) > 1 else first_strategy
 
-        return first_rhythm + second_rhythm
+        # 在第一部分的副本上原地追加第二部分：子策略返回元组或 array 时也可直接拼接，
+        # 且不修改子策略返回的序列
+        rhythm = list(first_strategy.generate(first_half_bars, **kwargs))
+        rhythm.extend(second_strategy.generate(second_half_bars, **kwargs))
+        return rhythm
 
 
 # ==================== 节奏生成器工厂类 ====================
@@ -370,6 +459,10 @@ class RhythmGenerator:
         """
         strategy_class = self.STRATEGIES.get(strategy_name, PatternBasedRhythmStrategy)
         self.strategy = strategy_class(beats_per_bar, **strategy_params)
+        # 预先绑定策略的 generate 方法，每次调用省去一次属性查找与方法绑定
+        self._strategy_generate = self.strategy.generate
+        # 休止符抽签与策略共用随机数生成器（自定义策略未设置时回退到全局 random）
+        self._rng = getattr(self.strategy, "_rng", random)
 
     def generate(self, num_bars: int = 4, **kwargs) -> List[float]:
         """
@@ -382,7 +475,7 @@ class RhythmGenerator:
         Returns:
             时值列表
         """
-        return self.strategy.generate(num_bars, **kwargs)
+        return self._strategy_generate(num_bars, **kwargs)
 
     def generate_with_rests(self, num_bars: int = 4, rest_probability: float = 0.1,
                             **kwargs) -> List[Tuple[float, bool]]:
@@ -398,16 +491,25 @@ class RhythmGenerator:
             [(时值, 是否为音符), ...] 列表
         """
         durations = self.generate(num_bars, **kwargs)
-        result = []
+        flags = _draw_note_flags(len(durations), rest_probability, self._rng.random)
+        return list(zip(durations, flags))
 
-        for duration in durations:
-            if random.random() < rest_probability:
-                # 插入休止符
-                result.append((duration, False))
-            else:
-                result.append((duration, True))
+    def generate_with_rests_arrays(self, num_bars: int = 4, rest_probability: float = 0.1,
+                                   **kwargs) -> Tuple[array, array]:
+        """
+        生成带有休止符的节奏，以两列数组返回，不构建 (时值, 是否为音符) 元组
 
-        return result
+        Args:
+            num_bars: 小节数量
+            rest_probability: 休止符出现概率
+            **kwargs: 其他参数
+
+        Returns:
+            (时值数组 array('d'), 是否为音符数组 array('B'，1 为音符、0 为休止符))
+        """
+        durations = self.generate(num_bars, **kwargs)
+        flags = _draw_note_flags(len(durations), rest_probability, self._rng.random)
+        return array('d', durations), array('B', flags)
 
     def apply_velocity_pattern(self, durations: List[float],
                                pattern: str = "flat") -> List[int]:
@@ -421,48 +523,28 @@ class RhythmGenerator:
         Returns:
             力度列表 (0-127)
         """
-        velocities = []
-
-        if pattern == "flat":
-            velocities = [90] * len(durations)
+        count = len(durations)
 
-        elif pattern == "accent_downbeats":
+        if pattern == "accent_downbeats":
             # 强拍重音
-            beat_position = 0
-            for i, dur in enumerate(durations):
-                # 计算当前音符在每小节中的位置
-                if beat_position % self.strategy.beats_per_bar < 0.1:
-                    velocities.append(110)  # 强拍更响
-                else:
-                    velocities.append(75)   # 弱拍更轻
-                beat_position += dur
-
-        elif pattern == "syncopated":
-            # 切分音重音
-            for i in range(len(durations)):
-                if i % 2 == 1:  # 反拍重音
-                    velocities.append(100)
-                else:
-                    velocities.append(70)
-
-        elif pattern == "crescendo":
+            return _accent_velocities(durations, self.strategy.beats_per_bar)
+
+        if pattern == "syncopated":
+            # 切分音重音：正拍 70、反拍 100 交替，由一对力度重复后截断得到
+            velocities = [70, 100] * ((count + 1) // 2)
+            del velocities[count:]
+            return velocities
+
+        if pattern == "crescendo":
             # 渐强
-            velocities = [
-                int(60 + (i / len(durations)) * 60)
-                for i in range(len(durations))
-            ]
+            return [int(60 + (i / count) * 60) for i in range(count)]
 
-        elif pattern == "diminuendo":
+        if pattern == "diminuendo":
             # 渐弱
-            velocities = [
-                int(120 - (i / len(durations)) * 60)
-                for i in range(len(durations))
-            ]
+            return [int(120 - (i / count) * 60) for i in range(count)]
 
-        else:
-            velocities = [90] * len(durations)
-
-        return velocities
+        # flat 及未知模式
+        return [90] * count
 
     @classmethod
     def register_strategy(cls, name: str, strategy_class: type):
@@ -545,13 +627,18 @@ def get_rhythm_stats(durations: List[float]) -> Dict[str, float]:
     if not durations:
         return {}
 
+    # 总拍数只求和一次；最短/最长时值取自去重后排序的少量时值，不再对整个序列各扫描一遍
+    total = sum(durations)
+    count = len(durations)
+    unique = sorted(set(durations))
+
     return {
-        "total_beats": sum(durations),
-        "note_count": len(durations),
-        "average_duration": sum(durations) / len(durations),
-        "shortest_duration": min(durations),
-        "longest_duration": max(durations),
-        "unique_durations": len(set(durations))
+        "total_beats": total,
+        "note_count": count,
+        "average_duration": total / count,
+        "shortest_duration": unique[0],
+        "longest_duration": unique[-1],
+        "unique_durations": len(unique)
     }
 
 
@@ -2,13 +2,24 @@ import argparse
 import json
 import sys
 import os
+import random
 import itertools
 import logging
-from typing import List, Tuple, Union
+from array import array
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
 
 from core.theory import Chord, Key, get_scale_notes, get_diatonic_chord, ChordQuality, get_chord_intervals
 from generators import MelodyGenerator, HarmonyGenerator, RhythmGenerator, RhythmPattern
-from composers import SimpleArranger
+from composers import SimpleArranger, TrackColumns
+
+# orjson 为可选依赖：安装后用于加速预设解析，未安装时使用标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # ==================== 日志配置 ====================
 
@@ -87,6 +98,17 @@ def setup_logging(verbose: int = 0, quiet: bool = False, log_file: str = None):
 
 # ==================== 工具函数 ====================
 
+@lru_cache(maxsize=32)
+def _read_preset(preset_path: str, mtime: float) -> dict:
+    """
+    读取并解析预设文件，按 (路径, 修改时间) 缓存：
+    文件未改动时重复加载直接命中缓存，文件被修改后自动重新解析（解析失败不会被缓存）
+    """
+    with open(preset_path, 'rb') as f:
+        data = f.read()
+    # orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，调用方的异常处理无需区分
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 def load_preset(name: str, logger: logging.Logger) -> dict:
     """加载预设配置文件"""
     preset_path = f"presets/{name}.json"
@@ -97,10 +119,11 @@ def load_preset(name: str, logger: logging.Logger) -> dict:
         sys.exit(1)
 
     try:
-        with open(preset_path, 'r', encoding='utf-8') as f:
-            preset = json.load(f)
+        preset = _read_preset(preset_path, os.path.getmtime(preset_path))
         logger.debug(f"Loaded preset from: {preset_path}")
-        logger.debug(f"Preset content: {json.dumps(preset, indent=2, ensure_ascii=False)}")
+        # 完整序列化整个预设代价较高，仅在 DEBUG 级别启用时执行
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Preset content: {json.dumps(preset, indent=2, ensure_ascii=False)}")
         return preset
     except json.JSONDecodeError as e:
         logger.error(f"Invalid JSON in preset file '{preset_path}': {e}")
@@ -115,34 +138,80 @@ def get_available_presets() -> List[str]:
     if not os.path.exists(presets_dir):
         return []
 
-    presets = []
-    for filename in os.listdir(presets_dir):
-        if filename.endswith('.json'):
-            presets.append(filename[:-5])  # 移除 .json 扩展名
-    return sorted(presets)
+    # scandir 的目录项自带文件类型信息，一次遍历完成筛选
+    with os.scandir(presets_dir) as entries:
+        return sorted(
+            entry.name[:-5]  # 移除 .json 扩展名
+            for entry in entries
+            if entry.name.endswith('.json') and entry.is_file()
+        )
 
-def display_preset_info(preset: dict, logger: logging.Logger):
+@dataclass(frozen=True, slots=True)
+class PresetView:
+    """预设的扁平视图：各层配置在加载后统一解析一次，默认值集中在 from_preset 中"""
+    key_name: str
+    tempo: int
+    bars: int
+    melody: Optional[dict]
+    harmony: Optional[dict]
+    rhythm: Optional[dict]
+    melody_strategy: str
+    velocity_curve: str
+    melody_program: int
+    progression: str
+    voicing: str
+    harmony_program: int
+    bass_program: int
+    rhythm_pattern: str
+    rhythm_style: Optional[str]
+
+    @classmethod
+    def from_preset(cls, preset: dict) -> "PresetView":
+        """从预设字典构建视图，缺失的配置项使用默认值"""
+        melody = preset.get("melody")
+        harmony = preset.get("harmony")
+        rhythm = preset.get("rhythm")
+        melody_cfg = melody or {}
+        harmony_cfg = harmony or {}
+        rhythm_cfg = rhythm or {}
+        return cls(
+            key_name=preset.get("key", "C_MAJOR"),
+            tempo=preset.get("tempo", 120),
+            bars=preset.get("structure", {}).get("bars", 16),
+            melody=melody,
+            harmony=harmony,
+            rhythm=rhythm,
+            melody_strategy=melody_cfg.get("strategy", "structured"),
+            velocity_curve=melody_cfg.get("velocity_curve", "flat"),
+            # 音色默认为 0 (钢琴)，低音默认为 32 (Acoustic Bass)
+            melody_program=melody_cfg.get("program", 0),
+            progression=harmony_cfg.get("progression", "pop_basic"),
+            voicing=harmony_cfg.get("voicing", "close"),
+            harmony_program=harmony_cfg.get("program", 0),
+            bass_program=harmony_cfg.get("bass_program", 32),
+            rhythm_pattern=rhythm_cfg.get("pattern", "steady"),
+            rhythm_style=rhythm_cfg.get("style"),
+        )
+
+def display_preset_info(view: PresetView, logger: logging.Logger):
     """显示预设配置信息"""
     logger.info("="*60)
     logger.info("预设配置信息 (Preset Configuration)")
     logger.info("="*60)
-    logger.info(f"调性 (Key): {preset.get('key', 'C_MAJOR')}")
-    logger.info(f"速度 (Tempo): {preset.get('tempo', 120)} BPM")
-    logger.info(f"小节数 (Bars): {preset.get('structure', {}).get('bars', 16)}")
+    logger.info(f"调性 (Key): {view.key_name}")
+    logger.info(f"速度 (Tempo): {view.tempo} BPM")
+    logger.info(f"小节数 (Bars): {view.bars}")
 
-    if 'melody' in preset:
-        melody = preset['melody']
-        logger.info(f"旋律策略 (Melody Strategy): {melody.get('strategy', 'structured')}")
-        logger.info(f"力度曲线 (Velocity Curve): {melody.get('velocity_curve', 'flat')}")
+    if view.melody is not None:
+        logger.info(f"旋律策略 (Melody Strategy): {view.melody_strategy}")
+        logger.info(f"力度曲线 (Velocity Curve): {view.velocity_curve}")
 
-    if 'harmony' in preset:
-        harmony = preset['harmony']
-        logger.info(f"和弦进行 (Harmony Progression): {harmony.get('progression', 'pop_basic')}")
-        logger.info(f"和弦类型 (Voicing): {harmony.get('voicing', 'close')}")
+    if view.harmony is not None:
+        logger.info(f"和弦进行 (Harmony Progression): {view.progression}")
+        logger.info(f"和弦类型 (Voicing): {view.voicing}")
 
-    if 'rhythm' in preset:
-        rhythm = preset['rhythm']
-        logger.info(f"节奏模式 (Rhythm Pattern): {rhythm.get('pattern', 'steady')}")
+    if view.rhythm is not None:
+        logger.info(f"节奏模式 (Rhythm Pattern): {view.rhythm_pattern}")
 
     logger.info("="*60)
 
@@ -164,11 +233,212 @@ def display_generation_stats(stats: dict, logger: logging.Logger):
 
     logger.info("="*60)
 
+# ==================== 配置映射表 ====================
+
+# 预设中的节奏型名称 -> 节奏型
+RHYTHM_PATTERN_MAP = {
+    "steady": RhythmPattern.STEADY_QUARTERS,
+    "rock_beat": RhythmPattern.ROCK_BEAT,
+    "swing_eighths": RhythmPattern.SWING_EIGHTHS,
+    "syncopated_16": RhythmPattern.SYNCOPATED_16,
+    "techno": RhythmPattern.TECHNO,
+    "bossa_nova": RhythmPattern.BOSSA_NOVA,
+    "steady_eighths": RhythmPattern.STEADY_EIGHTHS,
+    "steady_quarters": RhythmPattern.STEADY_QUARTERS,
+}
+
+# flat 力度曲线的恒定力度，与 MelodyStrategy.apply_velocity_curve 的 flat 曲线一致
+FLAT_MELODY_VELOCITY = 80
+
+# open voicing 下的和弦性质升级映射
+OPEN_VOICING_QUALITIES = {
+    ChordQuality.MAJOR: ChordQuality.MAJOR_SEVENTH,
+    ChordQuality.MINOR: ChordQuality.MINOR_SEVENTH,
+    ChordQuality.DOMINANT_SEVENTH: ChordQuality.DOMINANT_NINTH,
+}
+
+# voicing 类型 -> 和弦性质映射，未列出的类型（如 close）保持原和弦性质
+VOICING_QUALITY_MAPS = {
+    "open": OPEN_VOICING_QUALITIES,
+}
+
+# 无法获取和弦进行时使用的简单三和弦音程
+TRIAD_INTERVALS = (0, 4, 7)
+
+# ==================== 琶音展开 ====================
+
+def expand_arpeggio(roots_durations: List[Tuple[int, float]],
+                    chord_intervals: List[Tuple[int, ...]],
+                    velocity: int = 80) -> TrackColumns:
+    """
+    将根音序列展开为琶音音符
+
+    Args:
+        roots_durations: [(根音, 时值), ...]
+        chord_intervals: 各和弦的音程元组，按下标循环对应到每个根音
+        velocity: 琶音力度
+
+    Returns:
+        按列存放的琶音音符，每个根音依次展开为其和弦的全部音
+    """
+    # 和弦音程随根音循环配对，不再逐个根音做取模与下标查找
+    paired = list(zip(roots_durations, itertools.cycle(chord_intervals)))
+    pitches = array('h', [
+        root_note + interval
+        for (root_note, _), intervals in paired
+        for interval in intervals
+    ])
+    durations = array('d', [
+        duration
+        for (_, duration), intervals in paired
+        for _ in intervals
+    ])
+    return TrackColumns(pitches, durations, array('B', [velocity]) * len(pitches))
+
+# ==================== 轨道生成 ====================
+
+def generate_melody_columns(view: PresetView, key: Key, bars: int, melody_seed: int,
+                            rhythm_seed: int, logger: logging.Logger) -> TrackColumns:
+    """
+    生成旋律轨道数据（节奏、音高、力度）
+
+    只依赖传入的配置与子种子，--parallel 模式下在子进程中执行，结果与串行模式一致
+    """
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    logger.info("\n[1/3] 生成旋律轨道...")
+    strategy_name = view.melody_strategy
+
+    logger.debug(f"旋律策略: {strategy_name}")
+    if debug_enabled:
+        logger.debug(f"旋律配置: {json.dumps(view.melody, indent=2)}")
+
+    # 旋律使用全局随机数生成器，生成前以旋律子种子重新播种
+    random.seed(melody_seed)
+
+    # 创建旋律生成器
+    melody_gen = MelodyGenerator(strategy_name=strategy_name, key=key)
+    if debug_enabled:
+        logger.debug(f"可用旋律策略: {MelodyGenerator.get_available_strategies()}")
+
+    # 生成节奏
+    logger.info("  - 生成节奏模式...")
+    rhythm_style = view.rhythm_style
+
+    if rhythm_style:
+        rhythm_gen = RhythmGenerator("groove", style=rhythm_style, seed=rhythm_seed)
+        logger.debug(f"使用风格节奏: {rhythm_style}")
+    else:
+        target_pattern = RHYTHM_PATTERN_MAP.get(view.rhythm_pattern, RhythmPattern.STEADY_QUARTERS)
+        rhythm_gen = RhythmGenerator("pattern", pattern=target_pattern, seed=rhythm_seed)
+        logger.debug(f"使用模式节奏: {target_pattern.value}")
+
+    durations = rhythm_gen.generate(num_bars=bars)
+    logger.debug(f"生成的节奏时长列表: {len(durations)} 项")
+
+    # 生成旋律：音符数与节奏时值个数一致，不再按小节数估算后多生成
+    length = max(len(durations), 1)
+    logger.debug(f"生成旋律长度: {length} 音符")
+    melody_pitches = melody_gen.generate(length=length)
+    logger.debug(f"实际生成旋律音符数: {len(melody_pitches)}")
+
+    # 应用力度曲线
+    curve_type = view.velocity_curve
+    logger.debug(f"应用力度曲线: {curve_type}")
+    if curve_type == "flat":
+        # 平直曲线即恒定力度，只需一个值循环取用，不必按旋律长度生成整列
+        base_velocities = [FLAT_MELODY_VELOCITY]
+    else:
+        base_velocities = melody_gen.strategy.apply_velocity_curve(melody_pitches, curve_type=curve_type)
+
+    # 组合旋律数据
+    logger.debug("组合旋律音高、节奏和力度...")
+    # 音高与力度循环取用，与时值逐个对应；按列存放，不构建逐音符元组
+    note_count = len(durations)
+    melody_data = TrackColumns(
+        array('h', itertools.islice(itertools.cycle(melody_pitches), note_count)),
+        array('d', durations),
+        array('B', itertools.islice(itertools.cycle(base_velocities), note_count)),
+    )
+
+    logger.info(f"  ✓ 旋律生成完成: {note_count} 音符")
+    if debug_enabled:
+        logger.debug(f"  旋律音域: {min(melody_data.pitches)} - {max(melody_data.pitches)}")
+        logger.debug(f"  力度范围: {min(melody_data.velocities)} - {max(melody_data.velocities)}")
+
+    return melody_data
+
+def generate_harmony_columns(view: PresetView, key: Key, bars: int, harmony_seed: int,
+                             logger: logging.Logger) -> Tuple[TrackColumns, List[Tuple[int, float]]]:
+    """
+    生成和声轨道数据（琶音）
+
+    同时返回和弦根音序列，供低音轨道复用
+    """
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    logger.info("\n[2/3] 生成和声轨道...")
+    progression_name = view.progression
+    voicing_type = view.voicing
+
+    logger.debug(f"和弦进行: {progression_name}")
+    logger.debug(f"和弦类型: {voicing_type}")
+
+    # 和声使用全局随机数生成器，生成前以和声子种子重新播种
+    random.seed(harmony_seed)
+
+    # 实例化和声生成器
+    harmony_gen = HarmonyGenerator(
+        strategy_name="progression",
+        key=key,
+        progression_name=progression_name,
+        beats_per_bar=4
+    )
+
+    # 生成基础根音和时值
+    roots_durations = harmony_gen.generate(num_bars=bars)
+    logger.debug(f"生成的和弦数量: {len(roots_durations)}")
+
+    # 生成琶音
+    logger.info("  - 生成和弦琶音...")
+
+    if hasattr(harmony_gen.strategy, 'progression') and harmony_gen.strategy.progression:
+        prog_chords = harmony_gen.strategy.progression.chords
+
+        # 每个进行和弦只计算一次 voicing 与音程，而不是每个根音重复计算
+        voicing_map = VOICING_QUALITY_MAPS.get(voicing_type, {})
+        chord_intervals = []
+        for degree, quality in prog_chords:
+            # 处理 voicing
+            final_quality = voicing_map.get(quality, quality)
+            intervals = get_chord_intervals(final_quality)
+            if debug_enabled:
+                logger.debug(f"和弦 degree={degree}, quality={final_quality.value}, intervals={intervals}")
+            chord_intervals.append(intervals)
+
+        # 和弦名称只用于调试输出
+        if debug_enabled:
+            chord_names = [Chord(root=degree-1, quality=quality).get_chord_name(key)
+                           for degree, quality in prog_chords]
+            logger.debug(f"和弦进行: {' - '.join(chord_names)}")
+
+        # 生成琶音音符
+        arpeggio_data = expand_arpeggio(roots_durations, chord_intervals)
+    else:
+        # 降级处理
+        logger.warning("无法获取和弦进行信息，使用简单三和弦")
+        arpeggio_data = expand_arpeggio(roots_durations, [TRIAD_INTERVALS])
+
+    logger.info(f"  ✓ 和声生成完成: {len(arpeggio_data.pitches)} 音符")
+    if debug_enabled:
+        logger.debug(f"  和弦音域: {min(arpeggio_data.pitches)} - {max(arpeggio_data.pitches)}")
+
+    return arpeggio_data, roots_durations
+
 # ==================== 生成器适配器 ====================
 
 class PrecomputedGenerator:
     """适配器类：包装预计算好的数据传递给 SimpleArranger"""
-    def __init__(self, data: List[Union[int, Tuple[int, float], Tuple[int, float, int]]], track_name: str = "Unknown"):
+    def __init__(self, data: Union[TrackColumns, List[Union[int, Tuple[int, float], Tuple[int, float, int]]]],
+                 track_name: str = "Unknown"):
         self.data = data
         self.track_name = track_name
 
@@ -199,6 +469,15 @@ def main():
   # 将日志保存到文件
   python main.py --preset pop --output pop.mid --log-file generation.log
 
+  # 固定随机种子，多次运行得到相同结果
+  python main.py --preset pop --output pop.mid --seed 42
+
+  # 旋律在独立进程中与和声并行生成
+  python main.py --preset jazz --output jazz.mid --parallel
+
+  # 长曲目流式写入，音轨编码后不再保留在内存中
+  python main.py --preset classical --output long.mid --bars 2000 --stream
+
   # 列出可用预设
   python main.py --list-presets
         """
@@ -207,6 +486,7 @@ def main():
     parser.add_argument("--preset", default="pop", help="预设名称 (默认: pop)")
     parser.add_argument("--output", default="output.mid", help="输出 MIDI 文件路径")
     parser.add_argument("--bars", type=int, default=None, help="生成的小节数量")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，指定后生成结果可复现")
 
     # 日志相关参数
     parser.add_argument("-v", "--verbose", action="count", default=0,
@@ -219,6 +499,10 @@ def main():
                         help="列出所有可用的预设并退出")
     parser.add_argument("--show-info", action="store_true",
                         help="显示预设详细信息")
+    parser.add_argument("--parallel", action="store_true",
+                        help="在独立进程中生成旋律，同时生成和声（结果与串行模式相同）")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式写入：每条音轨生成后立即编码到临时文件，降低长曲目的内存占用")
 
     args = parser.parse_args()
 
@@ -241,27 +525,42 @@ def main():
     # 加载预设
     logger.info(f"加载预设: {args.preset}")
     preset = load_preset(args.preset, logger)
+    view = PresetView.from_preset(preset)
 
     # 显示预设信息
     if args.show_info or args.verbose >= 1:
-        display_preset_info(preset, logger)
+        display_preset_info(view, logger)
 
     # 解析配置
     try:
-        key = Key[preset.get("key", "C_MAJOR")]
+        key = Key[view.key_name]
     except KeyError:
-        logger.warning(f"Unknown key '{preset.get('key')}', using C_MAJOR")
+        logger.warning(f"Unknown key '{view.key_name}', using C_MAJOR")
         key = Key.C_MAJOR
 
-    tempo = preset.get("tempo", 120)
-    bars = args.bars if args.bars is not None else preset.get("structure", {}).get("bars", 16)
+    tempo = view.tempo
+    bars = args.bars if args.bars is not None else view.bars
 
     logger.info(f"基本参数: Key={key.value}, Tempo={tempo} BPM, Bars={bars}")
-    logger.debug(f"预设详细内容:\n{json.dumps(preset, indent=2, ensure_ascii=False)}")
+
+    # 以下需要序列化配置或遍历整条音轨的调试输出，仅在 DEBUG 级别启用时计算
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    if debug_enabled:
+        logger.debug(f"预设详细内容:\n{json.dumps(preset, indent=2, ensure_ascii=False)}")
+
+    # 旋律与和声使用全局随机数生成器，节奏与人性化偏移使用各自的独立生成器；
+    # 每个使用者从同一种子源派生各自的子种子，互不共享同一随机序列，
+    # 旋律也因此可以在子进程中生成而结果不变。未指定 --seed 时种子源取系统熵
+    seed_source = random.Random(args.seed)
+    melody_seed, harmony_seed, rhythm_seed, arranger_seed = (
+        seed_source.getrandbits(32) for _ in range(4)
+    )
+    if args.seed is not None:
+        logger.info(f"随机种子: {args.seed}")
 
     # 初始化编曲器
     logger.info("初始化编曲器...")
-    arranger = SimpleArranger(tempo=tempo, key=key)
+    arranger = SimpleArranger(tempo=tempo, key=key, seed=arranger_seed, stream=args.stream)
     logger.debug(f"编曲器参数: ticks_per_beat={arranger.ticks_per_beat}")
 
     # 统计信息
@@ -271,84 +570,41 @@ def main():
         "duration_beats": 0
     }
 
-    # ==================== 旋律轨道 ====================
-    if "melody" in preset:
-        logger.info("\n[1/3] 生成旋律轨道...")
-        melody_cfg = preset["melody"]
-        strategy_name = melody_cfg.get("strategy", "structured")
-
-        logger.debug(f"旋律策略: {strategy_name}")
-        logger.debug(f"旋律配置: {json.dumps(melody_cfg, indent=2)}")
-
-        # 创建旋律生成器
-        melody_gen = MelodyGenerator(strategy_name=strategy_name, key=key)
-        logger.debug(f"可用旋律策略: {MelodyGenerator.get_available_strategies()}")
-
-        # 生成旋律
-        length = bars * 4 * 2  # 估算长度
-        logger.debug(f"生成旋律长度: {length} 音符")
-        melody_pitches = melody_gen.generate(length=length)
-        logger.debug(f"实际生成旋律音符数: {len(melody_pitches)}")
-
-        # 生成节奏
-        logger.info("  - 生成节奏模式...")
-        rhythm_cfg = preset.get("rhythm", {})
-        pattern_map = {
-            "steady": RhythmPattern.STEADY_QUARTERS,
-            "rock_beat": RhythmPattern.ROCK_BEAT,
-            "swing_eighths": RhythmPattern.SWING_EIGHTHS,
-            "syncopated_16": RhythmPattern.SYNCOPATED_16,
-            "techno": RhythmPattern.TECHNO,
-            "bossa_nova": RhythmPattern.BOSSA_NOVA,
-            "steady_eighths": RhythmPattern.STEADY_EIGHTHS,
-            "steady_quarters": RhythmPattern.STEADY_QUARTERS,
-        }
-        target_pattern = pattern_map.get(rhythm_cfg.get("pattern", "steady"), RhythmPattern.STEADY_QUARTERS)
-
-        if rhythm_cfg.get("style"):
-            rhythm_gen = RhythmGenerator("groove", style=rhythm_cfg.get("style"))
-            logger.debug(f"使用风格节奏: {rhythm_cfg.get('style')}")
-        else:
-            rhythm_gen = RhythmGenerator("pattern", pattern=target_pattern)
-            logger.debug(f"使用模式节奏: {target_pattern.value}")
-
-        durations = rhythm_gen.generate(num_bars=bars)
-        logger.debug(f"生成的节奏时长列表: {len(durations)} 项")
-
-        # 应用力度曲线
-        curve_type = melody_cfg.get("velocity_curve", "flat")
-        logger.debug(f"应用力度曲线: {curve_type}")
-        base_velocities = melody_gen.strategy.apply_velocity_curve(melody_pitches, curve_type=curve_type)
-
-        # 组合旋律数据
-        logger.debug("组合旋律音高、节奏和力度...")
-        melody_data = []
-        pitch_iter = itertools.cycle(melody_pitches)
-        vel_iter = itertools.cycle(base_velocities)
+    # ==================== 旋律与和声生成 ====================
+    melody_data = None
+    harmony_data = None
+    if args.parallel and view.melody is not None and view.harmony is not None:
+        # 并行模式：计算量最大的旋律（遗传算法、MCTS 等策略）在子进程中生成，父进程同时生成和声
+        logger.info("并行模式：旋律在独立进程中生成")
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            melody_future = executor.submit(generate_melody_columns, view, key, bars,
+                                            melody_seed, rhythm_seed, logger)
+            harmony_data = generate_harmony_columns(view, key, bars, harmony_seed, logger)
+            melody_data = melody_future.result()
+    else:
+        if view.melody is not None:
+            melody_data = generate_melody_columns(view, key, bars, melody_seed, rhythm_seed, logger)
+        if view.harmony is not None:
+            harmony_data = generate_harmony_columns(view, key, bars, harmony_seed, logger)
 
-        for i, dur in enumerate(durations):
-            note = next(pitch_iter)
-            vel = next(vel_iter)
-            melody_data.append((note, dur, vel))
+    # ==================== 旋律轨道 ====================
+    if melody_data is not None:
+        note_count = len(melody_data.pitches)
 
         # 记录统计
         track_stats = {
             "name": "Melody",
             "channel": 0,
-            "note_count": len(melody_data),
-            "strategy": strategy_name,
-            "velocity_curve": curve_type
+            "note_count": note_count,
+            "strategy": view.melody_strategy,
+            "velocity_curve": view.velocity_curve
         }
         generation_stats["tracks"].append(track_stats)
-        generation_stats["total_notes"] += len(melody_data)
-        generation_stats["duration_beats"] += sum(d for _, d, _ in melody_data)
-
-        logger.info(f"  ✓ 旋律生成完成: {len(melody_data)} 音符")
-        logger.debug(f"  旋律音域: {min(m[0] for m in melody_data)} - {max(m[0] for m in melody_data)}")
-        logger.debug(f"  力度范围: {min(m[2] for m in melody_data)} - {max(m[2] for m in melody_data)}")
+        generation_stats["total_notes"] += note_count
+        generation_stats["duration_beats"] += sum(melody_data.durations)
 
         # 音色读取，默认为 0 (钢琴)
-        melody_program = melody_cfg.get("program", 0)
+        melody_program = view.melody_program
         logger.debug(f"  旋律音色 (Program): {melody_program}")
 
         # 添加到编曲器
@@ -360,86 +616,23 @@ def main():
         )
 
     # ==================== 和声轨道 ====================
-    if "harmony" in preset:
-        logger.info("\n[2/3] 生成和声轨道...")
-        harmony_cfg = preset["harmony"]
-        progression_name = harmony_cfg.get("progression", "pop_basic")
-        voicing_type = harmony_cfg.get("voicing", "close")
-
-        logger.debug(f"和弦进行: {progression_name}")
-        logger.debug(f"和弦类型: {voicing_type}")
-
-        # 实例化和声生成器
-        harmony_gen = HarmonyGenerator(
-            strategy_name="progression",
-            key=key,
-            progression_name=progression_name,
-            beats_per_bar=4
-        )
-
-        # 生成基础根音和时值
-        roots_durations = harmony_gen.generate(num_bars=bars)
-        logger.debug(f"生成的和弦数量: {len(roots_durations)}")
-
-        # 生成琶音
-        logger.info("  - 生成和弦琶音...")
-        arpeggio_data = []
-
-        if hasattr(harmony_gen.strategy, 'progression') and harmony_gen.strategy.progression:
-            prog_chords = harmony_gen.strategy.progression.chords
-            prog_len = len(prog_chords)
-
-            # 显示和弦进行
-            chord_names = []
-            for degree, quality in prog_chords:
-                chord = Chord(root=degree-1, quality=quality)
-                chord_names.append(chord.get_chord_name(key))
-            logger.debug(f"和弦进行: {' - '.join(chord_names)}")
-
-            for i, (root_note, duration) in enumerate(roots_durations):
-                degree, quality = prog_chords[i % prog_len]
-
-                # 处理 voicing
-                final_quality = quality
-                if voicing_type == "open":
-                    if quality == ChordQuality.MAJOR:
-                        final_quality = ChordQuality.MAJOR_SEVENTH
-                    elif quality == ChordQuality.MINOR:
-                        final_quality = ChordQuality.MINOR_SEVENTH
-                    elif quality == ChordQuality.DOMINANT_SEVENTH:
-                        final_quality = ChordQuality.DOMINANT_NINTH
-
-                # 获取音程
-                intervals = get_chord_intervals(final_quality)
-                logger.debug(f"和弦 {i+1}: degree={degree}, quality={final_quality.value}, intervals={intervals}")
-
-                # 生成琶音音符
-                for interval in intervals:
-                    arpeggio_data.append((root_note + interval, duration, 80))
-        else:
-            # 降级处理
-            logger.warning("无法获取和弦进行信息，使用简单三和弦")
-            for root_note, duration in roots_durations:
-                for interval in [0, 4, 7]:
-                    arpeggio_data.append((root_note + interval, duration, 80))
+    if harmony_data is not None:
+        arpeggio_data, roots_durations = harmony_data
 
         # 记录统计
         track_stats = {
             "name": "Harmony",
             "channel": 1,
-            "note_count": len(arpeggio_data),
-            "progression": progression_name,
-            "voicing": voicing_type
+            "note_count": len(arpeggio_data.pitches),
+            "progression": view.progression,
+            "voicing": view.voicing
         }
         generation_stats["tracks"].append(track_stats)
-        generation_stats["total_notes"] += len(arpeggio_data)
-        generation_stats["duration_beats"] += sum(d for _, d, _ in arpeggio_data)
-
-        logger.info(f"  ✓ 和声生成完成: {len(arpeggio_data)} 音符")
-        logger.debug(f"  和弦音域: {min(m[0] for m in arpeggio_data)} - {max(m[0] for m in arpeggio_data)}")
+        generation_stats["total_notes"] += len(arpeggio_data.pitches)
+        generation_stats["duration_beats"] += sum(arpeggio_data.durations)
 
         # 音色读取，默认为 0 (钢琴)
-        harmony_program = harmony_cfg.get("program", 0)
+        harmony_program = view.harmony_program
         logger.debug(f"  和声音色 (Program): {harmony_program}")
 
         # 添加到编曲器
@@ -451,37 +644,34 @@ def main():
         )
 
     # ==================== 低音轨道 ====================
-    if "harmony" in preset:
+    if harmony_data is not None:
         logger.info("\n[3/3] 生成低音轨道...")
-        harmony_cfg = preset["harmony"]
 
-        bass_gen = HarmonyGenerator(
-            strategy_name="progression",
-            key=key,
-            progression_name=preset["harmony"].get("progression"),
-            beats_per_bar=4
+        # 复用和声轨道已生成的根音序列，低一个八度，避免重复生成和声
+        bass_pitches = array('h', [note - 12 for note, _ in roots_durations])
+        bass_data = TrackColumns(
+            bass_pitches,
+            array('d', [dur for _, dur in roots_durations]),
+            array('B', [100]) * len(bass_pitches),
         )
-        bass_roots = bass_gen.generate(num_bars=bars)
-
-        # 低音低一个八度
-        bass_data = [(note - 12, dur, 100) for note, dur in bass_roots]
 
         # 记录统计
         track_stats = {
             "name": "Bass",
             "channel": 2,
-            "note_count": len(bass_data),
+            "note_count": len(bass_pitches),
             "octave_shift": -12
         }
         generation_stats["tracks"].append(track_stats)
-        generation_stats["total_notes"] += len(bass_data)
-        generation_stats["duration_beats"] += sum(d for _, d, _ in bass_data)
+        generation_stats["total_notes"] += len(bass_pitches)
+        generation_stats["duration_beats"] += sum(bass_data.durations)
 
-        logger.info(f"  ✓ 低音生成完成: {len(bass_data)} 音符")
-        logger.debug(f"  低音音域: {min(m[0] for m in bass_data)} - {max(m[0] for m in bass_data)}")
+        logger.info(f"  ✓ 低音生成完成: {len(bass_pitches)} 音符")
+        if debug_enabled:
+            logger.debug(f"  低音音域: {min(bass_pitches)} - {max(bass_pitches)}")
 
         # 低音音色读取，默认为 32 (Acoustic Bass)
-        bass_program = harmony_cfg.get("bass_program", 32)
+        bass_program = view.bass_program
         logger.debug(f"  低音音色 (Program): {bass_program}")
 
         arranger.add_track(
@@ -6,6 +6,7 @@
 from .midi_writer import (
     NoteEvent,
     TrackData,
+    TrackArrays,
     MidiWriter,
     create_midi_from_simple_tracks,
 )
@@ -13,6 +14,7 @@ from .midi_writer import (
 __all__ = [
     'NoteEvent',
     'TrackData',
+    'TrackArrays',
     'MidiWriter',
     'create_midi_from_simple_tracks',
 ]
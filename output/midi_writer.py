@@ -5,41 +5,108 @@
 - 控制变更事件处理
 - 表情和力度曲线应用
 """
-from typing import List, Tuple, Optional, Dict, Union
+from typing import List, Tuple, Optional, Dict, Union, Sequence
+from array import array
 from dataclasses import dataclass
-from mido import MidiFile, MidiTrack, MetaMessage, Message
+from mido import MetaMessage
+import struct
 
-@dataclass
+@dataclass(slots=True)
 class NoteEvent:
     """音符事件数据类"""
     note: int      # MIDI 音高
     velocity: int  # 力度(0-127)
     duration: int  # 时长，单位为ticks
 
-@dataclass
+@dataclass(slots=True)
 class TrackData:
     """音轨数据类"""
     name: str
     channel: int
     events: List[NoteEvent]
 
+@dataclass(slots=True)
+class TrackArrays:
+    """按列存放的音轨数据类：音高、力度、时长(ticks) 三个等长序列，不为每个音符构建 NoteEvent"""
+    name: str
+    channel: int
+    notes: Sequence[int]
+    velocities: Sequence[int]
+    durations: Sequence[int]
+
+# 音轨结束标记：delta 0 + FF 2F 00
+_END_OF_TRACK = b'\x00\xff\x2f\x00'
+
+def _vlq(value: int) -> bytes:
+    """MIDI 变长整数编码（每字节 7 位，除最后一字节外最高位置 1）"""
+    if value < 0:
+        raise ValueError('message time must be non-negative in MIDI file')
+    groups = [value & 0x7f]
+    value >>= 7
+    while value:
+        groups.append((value & 0x7f) | 0x80)
+        value >>= 7
+    return bytes(reversed(groups))
+
+# 一至两字节可表示的 delta 时间 (0..16383 ticks) 的编码表，导入时生成，
+# 常见时值直接按下标取用，超出范围的才逐字节编码
+_VLQ_TABLE_SIZE = 1 << 14
+_VLQ_TABLE = tuple(
+    bytes((value,)) if value < 0x80 else bytes((0x80 | (value >> 7), value & 0x7f))
+    for value in range(_VLQ_TABLE_SIZE)
+)
+
+def _check_data_bytes(values: List[int], field: str):
+    """检查音高/力度等数据字节位于 0..127，与 mido 构造 Message 时的校验一致"""
+    if values and not (0 <= min(values) and max(values) <= 127):
+        raise ValueError(f'{field} must be in range 0..127')
+
+def _write_track_bytes(track_data: Union[TrackData, TrackArrays]) -> bytearray:
+    """
+    直接编码一条完整的 MTrk 块（块头 + 长度 + 事件数据），不构建 mido Message 对象
+    输出与 mido 逐条写入 note_on / note_off 的结果逐字节一致
+    """
+    if isinstance(track_data, TrackArrays):
+        notes, velocities, durations = track_data.notes, track_data.velocities, track_data.durations
+    else:
+        events = track_data.events
+        notes = [event.note for event in events]
+        velocities = [event.velocity for event in events]
+        durations = [event.duration for event in events]
+
+    channel = track_data.channel
+    if not 0 <= channel <= 15:
+        raise ValueError('channel must be in range 0..15')
+    _check_data_bytes(notes, 'note')
+    _check_data_bytes(velocities, 'velocity')
+
+    # 块头与长度占位，事件写完后回填长度
+    data = bytearray(b'MTrk\x00\x00\x00\x00\x00')
+    data.extend(MetaMessage('track_name', name=track_data.name).bytes())
+
+    # note_on 与 note_off 状态字节交替出现，不会触发 running status，每个事件都写完整状态字节
+    note_on = 0x90 | channel
+    note_off = 0x80 | channel
+    vlq_table = _VLQ_TABLE
+    for note, velocity, duration in zip(notes, velocities, durations):
+        data += bytes((0, note_on, note, velocity))
+        data += vlq_table[duration] if 0 <= duration < _VLQ_TABLE_SIZE else _vlq(duration)
+        data += bytes((note_off, note, 0))
+
+    data += _END_OF_TRACK
+    data[4:8] = struct.pack('>L', len(data) - 8)
+    return data
+
 class MidiWriter:
     def __init__(self, ticks_per_beat: int = 480):
         self.ticks_per_beat = ticks_per_beat
 
-    def write(self, tracks: List[TrackData], filepath: str):
-        """将音轨数据写入MIDI文件"""
-        mid = MidiFile(ticks_per_beat=self.ticks_per_beat)
-        for track_data in tracks:
-            track = MidiTrack()
-            mid.tracks.append(track)
-            # 添加音轨名称
-            track.append(MetaMessage('track_name', name=track_data.name))
-            # 添加音符事件
-            for event in track_data.events:
-                track.append(Message('note_on', note=event.note, velocity=event.velocity, time=0, channel=track_data.channel))
-                track.append(Message('note_off', note=event.note, velocity=0, time=event.duration, channel=track_data.channel))
-        mid.save(filepath)
+    def write(self, tracks: List[Union[TrackData, TrackArrays]], filepath: str):
+        """将音轨数据写入MIDI文件（格式 1），整个文件在内存中编码完成后一次写入"""
+        track_chunks = [_write_track_bytes(track_data) for track_data in tracks]
+        header = b'MThd' + struct.pack('>Lhhh', 6, 1, len(track_chunks), self.ticks_per_beat)
+        with open(filepath, 'wb') as outfile:
+            outfile.write(b''.join([header, *track_chunks]))
 
 def create_midi_from_simple_tracks(
     tracks: List[Tuple[str, int, List[Union[int, Tuple[int, float]]]]],
@@ -55,17 +122,10 @@ def create_midi_from_simple_tracks(
     midi_writer = MidiWriter(ticks_per_beat)
     track_data_list = []
     for name, channel, data in tracks:
-        events = []
-        for item in data:
-            if isinstance(item, tuple):
-                note, duration_beats = item
-            else:
-                note, duration_beats = item, 1.0
-            duration_ticks = int(duration_beats * ticks_per_beat)
-            events.append(NoteEvent(
-                note=note,
-                velocity=default_velocity,
-                duration=duration_ticks
-            ))
-        track_data_list.append(TrackData(name=name, channel=channel, events=events))
+        # 拆分为音高列与时值列，整列换算 ticks，按列交给写入器
+        pairs = [item if isinstance(item, tuple) else (item, 1.0) for item in data]
+        notes = array('h', [note for note, _ in pairs])
+        durations = array('l', [int(duration_beats * ticks_per_beat) for _, duration_beats in pairs])
+        velocities = array('h', [default_velocity]) * len(notes)
+        track_data_list.append(TrackArrays(name, channel, notes, velocities, durations))
     midi_writer.write(track_data_list, filepath)
@@ -0,0 +1,33 @@
+import unittest
+
+from composers.simple_arranger import _columns_from_notes
+
+
+class ColumnsFromNotesTest(unittest.TestCase):
+    """音符数据拆分为 (音高, 时值, 力度) 三列"""
+
+    def assertColumns(self, notes_data, expected):
+        pitches, durations, velocities = _columns_from_notes(notes_data)
+        self.assertEqual((list(pitches), list(durations), list(velocities)),
+                         tuple(list(column) for column in expected))
+
+    def test_uniform_formats(self):
+        self.assertColumns([60, 62], ([60, 62], [1.0, 1.0], [100, 100]))
+        self.assertColumns([(60, 0.5), (62, 1.0)], ([60, 62], [0.5, 1.0], [100, 100]))
+        self.assertColumns([(60, 0.5, 80), (62, 1.0, 90)], ([60, 62], [0.5, 1.0], [80, 90]))
+
+    def test_mixed_formats(self):
+        # 格式混合时逐项解析，与首项格式无关
+        self.assertColumns([(60, 1.0, 80), (62, 1.0)], ([60, 62], [1.0, 1.0], [80, 100]))
+        self.assertColumns([(60, 1.0), (62, 0.5, 70)], ([60, 62], [1.0, 0.5], [100, 70]))
+        self.assertColumns([60, (62, 2.0, 90), [64, 0.5]], ([60, 62, 64], [1.0, 2.0, 0.5], [100, 90, 100]))
+        self.assertColumns([(60, 1.0, 80, "extra"), (62,), "x", 64], ([60, 64], [1.0, 1.0], [80, 100]))
+
+    def test_unrecognized_input(self):
+        self.assertColumns([], ((), (), ()))
+        self.assertColumns(None, ((), (), ()))
+        self.assertColumns(["x", (60,)], ((), (), ()))
+
+
+if __name__ == "__main__":
+    unittest.main()